@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Mede o tempo de import de cada comando com -X importtime e falha se passar do orçamento ou carregar um módulo proibido.
+# Exemplo: python benchmarks/startup.py --repeat 10 --scale 2
+import os
+import sys
+sys.dont_write_bytecode = True
+
+import json
+import argparse
+import subprocess
+import statistics
+from typing import Dict, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+# Módulos que só os comandos que realmente compilam podem carregar
+HEAVY = ['build', 'watch', 'setup', 'update', 'project', 'zone_parser', 'zone_ir', 'dotenv', 'zipfile', 'asyncio', 'subprocess', 'tests', 'shared_cache', 'cache', 'daemon', 'check', 'multiprocessing']
+
+# (nome, argumentos do python, orçamento em ms além do próprio interpretador, módulos proibidos)
+CASES: List[Tuple[str, List[str], float, List[str]]] = [
+    ('--version', ['main.py', '--version'], 40, HEAVY),
+    ('--help', ['main.py', '--help'], 40, HEAVY),
+    ('build --help', ['main.py', 'build', '--help'], 50, HEAVY),
+    # Um build sem alterações não chega no Linker nem no empacotamento
+    ('import build', ['-c', 'import build'], 140, ['asyncio', 'zipfile', 'linker', 'archive', 'minify', 'multiprocessing']),
+    # O cliente do daemon, carregado por todo build antes de decidir onde compilar
+    ('import daemon', ['-c', 'import daemon'], 90, ['build', 'project', 'zone_parser', 'zone_ir', 'dotenv', 'asyncio', 'zipfile'])
+]
+
+def import_times(arguments: List[str]) -> Tuple[float, Dict[str, int]]:
+    # O bytecode dos módulos do projeto não é salvo (main.py), então a compilação deles entra na conta como no uso real
+    environment = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    child = subprocess.run([sys.executable, '-X', 'importtime', *arguments], cwd=SRC, env=environment, capture_output=True, text=True)
+
+    total = 0
+    modules: Dict[str, int] = {}
+    for line in child.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        fields = line[len('import time:'):].split('|')
+        if not fields[0].strip().isdigit():
+            continue # Cabeçalho da tabela
+
+        # Soma o tempo próprio de cada módulo, o acumulado só serve para mostrar os mais lentos
+        total += int(fields[0])
+        modules[fields[2].strip()] = int(fields[1])
+
+    return total / 1000, modules
+
+def forbidden_modules(modules: Dict[str, int], forbidden: List[str], preloaded: Set[str]) -> List[str]:
+    # Módulos que o próprio interpretador já carrega antes do main.py (o site do conda importa o zipfile) não contam
+    return [name for name in modules if name.split('.')[0] in forbidden and name not in preloaded]
+
+def main():
+    argument_parser = argparse.ArgumentParser('startup')
+    argument_parser.add_argument('--repeat', type=int, default=7, help='Runs per case (at least 3), the median is compared with the budget')
+    argument_parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget (slower machines, CI)')
+    argument_parser.add_argument('--top', type=int, default=0, help='Show the slowest imports of each case')
+    argument_parser.add_argument('--output', help='Save the results as JSON')
+    args = argument_parser.parse_args()
+
+    # Uma única execução varia demais (disco, CPU ocupada), a mediana de várias é comparada com o orçamento
+    repeat = max(3, args.repeat)
+
+    # O custo do próprio interpretador (site, encodings) não depende do t6modm e é descontado
+    baseline_runs = [import_times(['-c', 'pass']) for _ in range(repeat)]
+    baseline = statistics.median(run[0] for run in baseline_runs)
+    preloaded = {name for _total, modules in baseline_runs for name in modules}
+
+    failures = []
+    results = {'python': sys.version, 'baseline_ms': baseline, 'cases': {}}
+    print(f'baseline {baseline:8.1f} ms (median of {repeat})')
+    for name, arguments, budget, forbidden in CASES:
+        runs = [import_times(arguments) for _ in range(repeat)]
+        elapsed = statistics.median(run[0] for run in runs) - baseline
+        modules = {name: cumulative for _total, run_modules in runs for name, cumulative in run_modules.items()}
+        budget *= args.scale
+
+        loaded = forbidden_modules(modules, forbidden, preloaded)
+        status = 'ok' if elapsed <= budget and len(loaded) == 0 else 'FAIL'
+        print(f'  {name:16} {elapsed:8.1f} ms  (budget {budget:.1f} ms)  {status}')
+
+        if elapsed > budget:
+            failures.append(f'{name}: {elapsed:.1f} ms is over the {budget:.1f} ms budget')
+
+        if len(loaded) > 0:
+            failures.append(f'{name}: imports {", ".join(sorted(loaded))}')
+
+        for module, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f'      {module:30} {cumulative / 1000:8.1f} ms')
+
+        results['cases'][name] = {'ms': elapsed, 'budget_ms': budget, 'forbidden': loaded}
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if len(failures) > 0:
+        for failure in failures:
+            sys.stderr.write(f'startup regression: {failure}\n')
+
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
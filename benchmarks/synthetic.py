@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# Gera projetos sintéticos e mede o build_project de ponta a ponta com um Linker falso.
+# Exemplo: python benchmarks/synthetic.py --zones 50 --files 20000 --dependencies 8 --output results.json
+import os
+import sys
+sys.dont_write_bytecode = True
+
+import io
+import json
+import stat
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+# O Linker falso imita a saída do -v e só cria o fastfile na pasta de saída, demorando T6MODM_STUB_LINK_MS como um Linker de verdade
+STUB_LINKER = '''#!/usr/bin/env python3
+import os, sys, time
+args = sys.argv[1:]
+time.sleep(float(os.environ.get('T6MODM_STUB_LINK_MS', '0')) / 1000)
+output = args[args.index('--output-folder') + 1] if '--output-folder' in args else None
+for index, arg in enumerate(args):
+    if arg == '--load':
+        print(f'Loading zone "{os.path.basename(args[index + 1])}"', flush=True)
+if output is not None:
+    os.makedirs(output, exist_ok=True)
+    name = os.path.basename(args[-1].replace('\\\\', '/'))
+    print(f'Building zone "{name}"', flush=True)
+    with open(os.path.join(output, f'{name}.ff'), 'wb') as file:
+        file.write(b'\\0' * 1024)
+    print(f'Created zone "{name}"', flush=True)
+'''
+
+def write(file_path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as file:
+        file.write(content)
+
+def make_tools(folder: str) -> Dict[str, str]:
+    oat_home = os.path.join(folder, 'oat')
+    linker = os.path.join(oat_home, 'Linker.exe' if os.name == 'nt' else 'Linker')
+    write(linker, STUB_LINKER)
+    os.chmod(linker, os.stat(linker).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    game_home = os.path.join(folder, 'game')
+    write(os.path.join(game_home, 'zone', 'all', 'patch_zm.ff'), '')
+    return {'OAT_HOME': oat_home, 'GAME_HOME': game_home}
+
+def make_tree(src: str, config: argparse.Namespace, prefix: str, files: int, scripts: int) -> List[str]:
+    for index in range(files):
+        write(os.path.join(src, 'sound', prefix, f'{index // 100:04}', f'sound_{index}.wav'), 'RIFF')
+
+    names = []
+    for index in range(scripts):
+        name = f'scripts/zm/{prefix}/script_{index}.gsc'
+        write(os.path.join(src, name), f'// {name}\ninit()\n{{\n    level.value_{index} = {index};\n}}\n')
+        names.append(name)
+
+    return names
+
+def make_zones(src: str, config: argparse.Namespace, prefix: str, scripts: List[str]) -> None:
+    lines = ['>game,T6', '// synthetic zone', 'localize,mod', 'file: sound/** sound', f'serverfile: scripts/zm/{prefix}/*.gsc scripts/{prefix}']
+    for index in range(config.zones):
+        lines.append(f'include,{prefix}_zone_{index}_0')
+
+    for index, name in enumerate(scripts):
+        lines.append(f'script,{name}')
+
+    write(os.path.join(src, 'zone_source', 'mod.zone'), '\n'.join(lines) + '\n')
+
+    for zone in range(config.zones):
+        for depth in range(config.include_depth):
+            body = [f'// zone {zone} depth {depth}']
+            for asset in range(config.assets):
+                body.append(f'xmodel,{prefix}_model_{zone}_{depth}_{asset}')
+
+            body.append(f'file_debug: sound/{prefix}/0000/*.wav debug_sound')
+            body.append(f'file_release: sound/{prefix}/0000/*.wav release_sound')
+            if depth + 1 < config.include_depth:
+                body.append(f'include,{prefix}_zone_{zone}_{depth + 1}')
+
+            write(os.path.join(src, 'zone_source', f'{prefix}_zone_{zone}_{depth}.zone'), '\n'.join(body) + '\n')
+
+def make_project(home: str, config: argparse.Namespace) -> None:
+    dependencies = []
+    for index in range(config.dependencies):
+        dependency_home = os.path.join(home, 'dependencies', f'dependency_{index}')
+        src = os.path.join(dependency_home, 'src')
+        scripts = make_tree(src, config, f'dependency_{index}', config.files // max(1, config.dependencies + 1), config.scripts)
+        make_zones(src, config, f'dependency_{index}', scripts)
+        write(os.path.join(dependency_home, 'project.t6modm.json'), json.dumps({'name': f'dependency_{index}'}))
+        dependencies.append(f'$HOME/dependencies/dependency_{index}')
+
+    src = os.path.join(home, 'src')
+    scripts = make_tree(src, config, 'project', config.files // max(1, config.dependencies + 1), config.scripts)
+    make_zones(src, config, 'project', scripts)
+
+    write(os.path.join(home, 'project.t6modm.json'), json.dumps({
+        'name': 'synthetic',
+        'description': 'Synthetic benchmark project',
+        'version': '1.0.0',
+        'author': 'benchmark',
+        'dependencies': dependencies,
+        'fastfiles': ['$GAME_HOME/zone/all/patch_zm.ff']
+    }, indent=4))
+
+def sum_spans(events: List[Dict[str, Any]], name: str) -> float:
+    return sum(event.get('dur', 0) for event in events if event['name'] == name and event['ph'] == 'X') / 1000
+
+def build_flags(args: argparse.Namespace) -> List[str]:
+    return [*(['--split'] if args.split else []), *(['--flatten'] if args.flatten else [])]
+
+def run_child(home: str, target: str, jobs: int, flags: List[str]) -> Dict[str, Any]:
+    # Executado num processo novo para cada repetição, assim o pico de memória é medido por execução
+    sys.path.insert(0, SRC)
+    from build import build_project, load_project
+    from profiler import profiler
+    from argument_parser import argument_parser
+
+    args = argument_parser.parse_args(['build', '--project-dir', home, '--target', target, '--jobs', str(jobs), '--force', *flags])
+    project = load_project(home)
+
+    profiler.enable()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_project(project, args)
+
+    total = time.perf_counter() - start
+    trace_path = os.path.join(home, 'trace.json')
+    profiler.write(trace_path)
+    with open(trace_path, 'r') as file:
+        trace = json.load(file)
+
+    events = trace['traceEvents']
+    metrics = {
+        'total_ms': total * 1000,
+        'parse_ms': sum_spans(events, 'parse'),
+        'glob_ms': sum_spans(events, 'glob'),
+        'link_ms': sum_spans(events, 'link'),
+        'zip_ms': sum_spans(events, 'package'),
+        'counters': trace['otherData']['counters']
+    }
+
+    try:
+        import resource
+        # ru_maxrss está em KiB no Linux
+        metrics['peak_memory_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        metrics['peak_memory_mb'] = None
+
+    return metrics
+
+def main():
+    argument_parser = argparse.ArgumentParser('synthetic')
+    argument_parser.add_argument('--zones', type=int, default=20, help='Included zones per project/dependency')
+    argument_parser.add_argument('--include-depth', type=int, default=3, help='Nested includes per zone')
+    argument_parser.add_argument('--assets', type=int, default=50, help='Asset lines per included zone')
+    argument_parser.add_argument('--dependencies', type=int, default=4)
+    argument_parser.add_argument('--files', type=int, default=5000, help='Files matched by file:/serverfile: globs, across the project and its dependencies')
+    argument_parser.add_argument('--scripts', type=int, default=50, help='script, lines per project/dependency')
+    argument_parser.add_argument('--target', default='release', help='A target, or a comma separated list of targets built in one run')
+    argument_parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    argument_parser.add_argument('--split', action='store_true', help='Link each dependency into its own fastfile')
+    argument_parser.add_argument('--flatten', action='store_true', help='Inline every included and dependency zone into one generated zone')
+    argument_parser.add_argument('--link-ms', type=float, default=0, help='How long the stand-in Linker takes per fastfile')
+    argument_parser.add_argument('--repeat', type=int, default=3)
+    argument_parser.add_argument('--output', help='Save the results as JSON')
+    argument_parser.add_argument('--keep', action='store_true', help='Keep the generated project')
+    argument_parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = argument_parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_child(args.child, args.target, args.jobs, build_flags(args))))
+        return
+
+    folder = tempfile.mkdtemp(prefix='t6modm-bench-')
+    try:
+        home = os.path.join(folder, 'project')
+        environment = dict(os.environ, **make_tools(folder), T6MODM_STUB_LINK_MS=str(args.link_ms))
+
+        start = time.perf_counter()
+        make_project(home, args)
+        generate = time.perf_counter() - start
+
+        runs = []
+        for _ in range(args.repeat):
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', home, '--target', args.target, '--jobs', str(args.jobs), *build_flags(args)],
+                env=environment, capture_output=True, text=True
+            )
+
+            if child.returncode != 0:
+                sys.stderr.write(child.stdout + child.stderr)
+                sys.exit(child.returncode)
+
+            runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+        best = {key: min(run[key] for run in runs) for key in ('total_ms', 'parse_ms', 'glob_ms', 'link_ms', 'zip_ms')}
+        best['peak_memory_mb'] = max((run['peak_memory_mb'] or 0) for run in runs)
+
+        config = {key: value for key, value in vars(args).items() if key not in ('child', 'output', 'keep')}
+        results = {'config': config, 'generate_s': generate, 'best': best, 'runs': runs, 'python': sys.version}
+
+        print(f'synthetic project: {json.dumps(config)}')
+        for key, value in best.items():
+            print(f'  {key:16} {value:10.1f}')
+
+        if args.output is not None:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=4)
+    finally:
+        if args.keep:
+            print(f'project kept at {home}')
+        else:
+            shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
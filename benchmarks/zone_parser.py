@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# Compara o laço antigo (todos os testes recebendo cada linha crua) com o despachante compilado do ZoneParser,
+# e o despachante lendo a zona com expressões regulares com ele lendo a IR do cache (em disco e na memória)
+import os
+import sys
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import time
+import json
+import argparse
+import tempfile
+import re
+from typing import Callable
+from file import File
+from project import Project
+from exceptions import ZoneNotFoundException
+from zone_ir import Include, ZoneCache
+from zone_parser import ZoneParser, ZoneWriter
+from tests.files import files
+from tests.filter_gsc import filter_gsc
+from tests.include_zone import include_zone
+from tests.filter_headers import filter_headers
+from tests.ignore_comments import ignore_comments
+
+# Os testes de antes do despachante (1558ccb^), cada um recebe a linha crua e roda a sua própria expressão regular
+class LegacyPatterns:
+    NOIGNORE = re.compile(r'\/\/\s*noignore', re.MULTILINE)
+    SCRIPT_STATEMENT = re.compile(r'script,\s*([^ ]+?)(?=\s*\/\/|$)', re.MULTILINE)
+    INCLUDE = re.compile(r'include,\s*([^ ]+?)(?=\s*\/\/|$)')
+    FILE_STATEMENT = re.compile(r'(file|file_debug|file_release):\s*([\~\-\&\w\/\.\*]+)\s+([\~\-\&\w\/\.\*]+)', re.MULTILINE)
+    SERVERFILE_STATEMENT = re.compile(r'(serverfile|serverfile_debug|serverfile_release):\s*([\~\-\&\w\/\.\*]+)\s+([\~\-\&\w\/\.\*]+)', re.MULTILINE)
+
+def legacy_ignore_comments(self: ZoneParser, line: str) -> bool:
+    return line.strip().startswith('//')
+
+def legacy_filter_headers(self: ZoneParser, line: str) -> bool:
+    if line.strip().startswith('>name,') or line.strip().startswith('>game,'):
+        self.output.append(f'// {line}')
+        return True
+
+    return False
+
+def legacy_filter_gsc(self: ZoneParser, line: str) -> bool:
+    if self.project.target == 'debug':
+        return False
+
+    test = re.match(LegacyPatterns.SCRIPT_STATEMENT, line)
+    if test is None or not test[1].endswith('.gsc'):
+        return False
+
+    search_path = self.project.asset_index.find(test[1])
+    if search_path is None or len(re.findall(LegacyPatterns.NOIGNORE, line)) > 0:
+        return False
+
+    self.project.filtered_scripts.append(File(os.path.join(search_path, os.path.normpath(test[1])), test[1]))
+    self.output.append(f'// {line}')
+    return True
+
+def legacy_include_zone(self: ZoneParser, line: str) -> bool:
+    test = re.match(LegacyPatterns.INCLUDE, line)
+    if test is None:
+        return False
+
+    # A zona sintética não tem includes, só o custo da expressão regular importa aqui
+    return include_zone(self, Include(self.line_number, line, test[1]))
+
+def _legacy_process(self: ZoneParser, test: re.Match[str]) -> None:
+    kind, _, target = test[1].partition('_')
+    if len(target) > 0 and target != self.project.target:
+        return
+
+    registry = self.project.files if kind == 'file' else self.project.serverfiles
+    for search_path in self.project.asset_search_path:
+        current_path = os.path.join(search_path, test[2])
+        for path in self.project.asset_index.glob(search_path, test[2]):
+            relative_path = os.path.relpath(path, os.path.commonpath([current_path.rstrip("*/"), path]))
+            registry.add(path, os.path.normpath(os.path.join(test[3], relative_path)))
+
+def legacy_files(self: ZoneParser, line: str) -> bool:
+    test1 = re.match(LegacyPatterns.FILE_STATEMENT, line)
+    test2 = re.match(LegacyPatterns.SERVERFILE_STATEMENT, line)
+    if test1 is None and test2 is None:
+        return False
+
+    if test1 is not None:
+        _legacy_process(self, test1)
+
+    if test2 is not None:
+        _legacy_process(self, test2)
+
+    self.output.append(f'// {line}')
+    return True
+
+class LegacyZoneParser(ZoneParser):
+    # O laço de antes do despachante: a zona inteira na memória e cada linha crua passa por todos os testes
+    def parse(self, output_file=None) -> str:
+        self.output = ZoneWriter()
+        with open(self.source_path, 'r') as source_file:
+            source = source_file.read()
+
+        for self.line_number, line in enumerate(source.split('\n'), 1):
+            prevent = False
+            for test in LEGACY_TESTS:
+                try:
+                    prevent = test(self, line)
+                except ZoneNotFoundException:
+                    pass
+
+                if prevent: break
+
+            if not prevent:
+                self.output.append(line)
+
+        return self.output.getvalue()
+
+LEGACY_TESTS = [legacy_ignore_comments, legacy_filter_headers, legacy_filter_gsc, legacy_include_zone, legacy_files]
+
+def make_project(home: str) -> Project:
+    os.makedirs(os.path.join(home, 'src', 'zone_source'), exist_ok=True)
+    os.makedirs(os.path.join(home, 'src', 'sound'), exist_ok=True)
+    for index in range(20):
+        with open(os.path.join(home, 'src', 'sound', f'sound_{index}.wav'), 'w') as file:
+            file.write('RIFF')
+
+    with open(os.path.join(home, 'project.t6modm.json'), 'w') as file:
+        json.dump({'name': 'benchmark', 'dependencies': [], 'fastfiles': []}, file)
+
+    return Project.from_file(os.path.join(home, 'project.t6modm.json'))
+
+def make_zone(file_path: str, lines: int) -> None:
+    with open(file_path, 'w') as file:
+        file.write('>game,T6\n')
+        for index in range(lines):
+            kind = index % 20
+            if kind < 11:
+                file.write(f'xmodel,model_{index}\n')
+            elif kind < 13:
+                file.write('localize,mod\n')
+            elif kind < 16:
+                file.write(f'// comment {index}\n')
+            elif kind == 16:
+                file.write('\n')
+            elif kind == 17:
+                file.write(f'script,scripts/zm/script_{index % 50}.gsc\n')
+            elif kind == 18:
+                file.write(f'fx,fx_{index}\n')
+            elif index % 1000 == 19:
+                file.write('file: sound/*.wav sound\n')
+            else:
+                file.write(f'material,material_{index}\n')
+
+def run(parser_class: type, project: Project, zone_path: str, repeat: int, zone_cache: Callable[[], ZoneCache | None]) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        project.zone_cache = zone_cache()
+        parser = parser_class(zone_path)
+        parser.project = project
+        parser.tests = [ignore_comments, filter_headers, filter_gsc, include_zone, files]
+
+        start = time.perf_counter()
+        parser.parse()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+def main():
+    argument_parser = argparse.ArgumentParser('zone_parser')
+    argument_parser.add_argument('--lines', type=int, default=100_000)
+    argument_parser.add_argument('--repeat', type=int, default=5)
+    args = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        project = make_project(home)
+        zone_path = os.path.join(home, 'src', 'zone_source', 'mod.zone')
+        make_zone(zone_path, args.lines)
+
+        legacy = run(LegacyZoneParser, project, zone_path, args.repeat, lambda: None)
+        dispatcher = run(ZoneParser, project, zone_path, args.repeat, lambda: None)
+
+        # Um ZoneCache novo a cada execução lê a IR do disco, como um build na linha de comando.
+        # O mesmo ZoneCache reaproveitado mede a IR que fica na memória entre os builds do daemon.
+        cache_folder = os.path.join(home, 'zones')
+        for _row in ZoneCache(cache_folder).load(zone_path):
+            pass
+
+        disk = run(ZoneParser, project, zone_path, args.repeat, lambda: ZoneCache(cache_folder))
+
+        memory_cache = ZoneCache(cache_folder, keep_in_memory=True)
+        for _row in memory_cache.load(zone_path):
+            pass
+
+        memory = run(ZoneParser, project, zone_path, args.repeat, lambda: memory_cache)
+
+    print(f'zone with {args.lines} lines (best of {args.repeat})')
+    for label, elapsed in (('legacy loop:', legacy), ('dispatcher:', dispatcher), ('IR (disk):', disk), ('IR (memory):', memory)):
+        print(f'  {label:13} {elapsed * 1000:8.1f} ms ({args.lines / elapsed:,.0f} lines/s, {legacy / elapsed:5.2f}x)')
+
+if __name__ == '__main__':
+    main()
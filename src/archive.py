@@ -0,0 +1,264 @@
+import os
+import copy
+import json
+import zlib
+import shutil
+import struct
+import hashlib
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Deque, Dict, Iterable, List, Tuple
+from file import File
+from staging import replace_if_changed
+from zipfile import ZipFile, ZipInfo, BadZipFile, ZIP_DEFLATED, ZIP64_LIMIT
+from profiler import profiler
+from shared_cache import shared_cache
+
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+CHECKSUM = struct.Struct('<L')
+DATA_DESCRIPTOR_FLAG = 0x08
+SHARED_MIN_SIZE = 4096 # Abaixo disso comprimir de novo é mais rápido que ler a entrada do cache
+SHARED_MAX_SIZE = 4 * 1024 * 1024 # Acima disso o membro é comprimido em streaming, sem passar pelo cache compartilhado
+CHUNK_SIZE = 1024 * 1024
+SPOOL_SIZE = 1024 * 1024 # Membros comprimidos maiores que isso esperam a vez de serem escritos em um arquivo temporário
+
+def compression_level(dest: str, compression: Dict[str, int | None]) -> int | None:
+    return compression.get(os.path.splitext(dest)[1].lower())
+
+def _fingerprint(source: str, level: int | None) -> List[int | str | None]:
+    stat = os.stat(source)
+    return [source, stat.st_size, stat.st_mtime_ns, level]
+
+def _compress(source: str, info: ZipInfo, level: int | None) -> BinaryIO:
+    # Executado nas threads do pool, o zlib libera o GIL enquanto comprime
+    info.CRC = 0
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    if info.is_dir():
+        info.compress_size = 0
+        return output
+
+    if level is not None:
+        info.compress_type = ZIP_DEFLATED
+
+    if level is not None and shared_cache.enabled and SHARED_MIN_SIZE <= info.file_size <= SHARED_MAX_SIZE:
+        with open(source, 'rb') as file:
+            data = file.read()
+
+        info.file_size = len(data)
+        info.CRC = zlib.crc32(data)
+        output.write(_deflate(data, level))
+    else:
+        _stream(source, info, level, output)
+
+    info.compress_size = output.tell()
+    output.seek(0)
+    return output
+
+def _stream(source: str, info: ZipInfo, level: int | None, output: BinaryIO) -> None:
+    # Lê e comprime em pedaços, um arquivo de som grande nunca fica inteiro na memória
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if level is not None else None
+    size = 0
+    crc = 0
+    with open(source, 'rb') as file:
+        while chunk := file.read(CHUNK_SIZE):
+            size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+            output.write(compressor.compress(chunk) if compressor is not None else chunk)
+
+    if compressor is not None:
+        output.write(compressor.flush())
+
+    info.file_size = size
+    info.CRC = crc
+
+def _deflate(data: bytes, level: int) -> bytes:
+    # Os mesmos bytes com o mesmo nível geram sempre o mesmo resultado, então outros projetos podem reaproveitá-lo
+    key: str | None = None
+    if shared_cache.enabled and len(data) >= SHARED_MIN_SIZE:
+        key = shared_cache.key('member', hashlib.sha1(data).hexdigest(), level)
+        cached = shared_cache.get('member', key)
+
+        # Uma entrada corrompida geraria um arquivo inválido, então cada uma guarda o CRC dos próprios bytes
+        if cached is not None and len(cached) >= CHECKSUM.size and CHECKSUM.unpack_from(cached)[0] == zlib.crc32(cached[CHECKSUM.size:]):
+            return cached[CHECKSUM.size:]
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    if key is not None:
+        shared_cache.put('member', key, CHECKSUM.pack(zlib.crc32(compressed)) + compressed)
+
+    return compressed
+
+def _append_member(target_zip: ZipFile, member: ZipInfo) -> None:
+    # Usa os atributos internos do ZipFile (fp, filelist, NameToInfo, start_dir), como o próprio ZipFile.write faz
+    assert target_zip.fp is not None
+    target_zip.filelist.append(member)
+    target_zip.NameToInfo[member.filename] = member
+    target_zip.start_dir = target_zip.fp.tell()
+    target_zip._didModify = True
+
+def _write_member(target_zip: ZipFile, info: ZipInfo, data: BinaryIO) -> None:
+    assert target_zip.fp is not None
+    info.header_offset = target_zip.fp.tell()
+    target_zip.fp.write(info.FileHeader(info.file_size > ZIP64_LIMIT or info.compress_size > ZIP64_LIMIT))
+    with data:
+        shutil.copyfileobj(data, target_zip.fp, CHUNK_SIZE)
+
+    _append_member(target_zip, info)
+
+def _copy_member(source_zip: ZipFile, info: ZipInfo, target_zip: ZipFile) -> None:
+    # Copia o cabeçalho local e os bytes já comprimidos, sem descomprimir nem comprimir de novo
+    assert source_zip.fp is not None and target_zip.fp is not None
+
+    source_zip.fp.seek(info.header_offset)
+    header = source_zip.fp.read(LOCAL_HEADER.size)
+    if len(header) < LOCAL_HEADER.size or LOCAL_HEADER.unpack(header)[0] != b'PK\x03\x04':
+        raise BadZipFile(f'bad local header: {info.filename}')
+
+    fields = LOCAL_HEADER.unpack(header)
+    name_length, extra_length = fields[-2], fields[-1]
+
+    member = copy.copy(info)
+    member.header_offset = target_zip.fp.tell()
+    target_zip.fp.write(header)
+
+    # Em pedaços, como os membros comprimidos agora
+    remaining = name_length + extra_length + info.compress_size
+    while remaining > 0:
+        chunk = source_zip.fp.read(min(remaining, CHUNK_SIZE))
+        if len(chunk) == 0:
+            raise BadZipFile(f'truncated member: {info.filename}')
+
+        target_zip.fp.write(chunk)
+        remaining -= len(chunk)
+
+    _append_member(target_zip, member)
+
+class ArchiveState:
+    # Guarda, para cada arquivo .iwd/.zip gerado, de onde veio cada membro (caminho, tamanho e data de modificação)
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.archives: Dict[str, Dict] = {}
+
+        try:
+            with open(file_path, 'r') as file:
+                self.archives = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with open(self.file_path, 'w') as file:
+            json.dump(self.archives, file)
+
+    def previous(self, archive_path: str) -> Dict[str, List[int | str | None]]:
+        state = self.archives.get(os.path.abspath(archive_path))
+        if state is None:
+            return {}
+
+        # O arquivo anterior precisa ser exatamente o que foi gerado da última vez
+        try:
+            stat = os.stat(archive_path)
+        except OSError:
+            return {}
+
+        if [stat.st_size, stat.st_mtime_ns] != state.get('archive'):
+            return {}
+
+        return state.get('members', {})
+
+    def update(self, archive_path: str, members: Dict[str, List[int | str | None]]) -> None:
+        stat = os.stat(archive_path)
+        self.archives[os.path.abspath(archive_path)] = {
+            'archive': [stat.st_size, stat.st_mtime_ns],
+            'members': members
+        }
+
+    def forget(self, archive_path: str) -> None:
+        self.archives.pop(os.path.abspath(archive_path), None)
+
+def write_archive(archive_path: str, files: Iterable[File], state: ArchiveState, compression: Dict[str, int | None], jobs: int, staged_path: str | None = None) -> Dict[str, List[int | str | None]]:
+    # Os membros vêm do arquivo anterior (archive_path), o novo vai para staged_path quando a saída está sendo montada ao lado.
+    # O estado só é atualizado por quem chama, depois que o arquivo está no lugar final.
+    files = list(files)
+    output_path = staged_path if staged_path is not None else archive_path
+    previous = state.previous(archive_path)
+    if len(previous) > 0:
+        try:
+            return _write_archive(archive_path, files, previous, compression, jobs, output_path)
+        except BadZipFile:
+            pass # O arquivo anterior está corrompido, o novo é montado do zero
+
+    return _write_archive(archive_path, files, {}, compression, jobs, output_path)
+
+def _write_archive(archive_path: str, files: List[File], previous: Dict[str, List[int | str | None]], compression: Dict[str, int | None], jobs: int, output_path: str) -> Dict[str, List[int | str | None]]:
+    previous_zip: ZipFile | None = None
+    if len(previous) > 0:
+        try:
+            previous_zip = ZipFile(archive_path, 'r')
+        except (OSError, BadZipFile):
+            previous = {}
+
+    members: Dict[str, List[int | str | None]] = {}
+    partial_path = f'{output_path}.partial'
+
+    # Os membros são comprimidos em paralelo, mas escritos na ordem do projeto para o resultado ser sempre o mesmo.
+    # A janela limita quantos membros esperam a vez de serem escritos, cada um com no máximo SPOOL_SIZE na memória.
+    window = max(1, jobs) * 4
+    pending: Deque[Tuple[ZipInfo, Future[BinaryIO] | None]] = deque()
+
+    def write_next() -> None:
+        info, future = pending.popleft()
+        if future is None:
+            _copy_member(previous_zip, info, zipfile)
+            if profiler.enabled:
+                profiler.count('archive.reused')
+            return
+
+        _write_member(zipfile, info, future.result())
+        if profiler.enabled:
+            profiler.count('archive.written')
+            profiler.count('archive.bytes', info.file_size)
+            profiler.count('archive.compressed_bytes', info.compress_size)
+
+    try:
+        with ZipFile(partial_path, 'w') as zipfile, ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            for file in files:
+                level = compression_level(file.dest, compression)
+                fingerprint = _fingerprint(file.source, level)
+                info = ZipInfo.from_file(file.source, file.dest)
+
+                # Mesmo destino, mesma compressão e mesma origem sem alterações: reaproveita os bytes do arquivo anterior
+                previous_info = previous_zip.NameToInfo.get(info.filename) if previous_zip is not None else None
+                if previous_info is not None and previous.get(info.filename) == fingerprint and not previous_info.flag_bits & DATA_DESCRIPTOR_FLAG:
+                    pending.append((previous_info, None))
+                else:
+                    pending.append((info, executor.submit(_compress, file.source, info, level)))
+
+                members[info.filename] = fingerprint
+                while len(pending) > window:
+                    write_next()
+
+            while len(pending) > 0:
+                write_next()
+    except BaseException:
+        try:
+            os.unlink(partial_path)
+        except OSError:
+            pass
+
+        raise
+    finally:
+        if previous_zip is not None:
+            previous_zip.close()
+
+    replace_if_changed(partial_path, output_path)
+    return members
+
+def remove_archive(archive_path: str, state: ArchiveState) -> None:
+    state.forget(archive_path)
+    try:
+        os.unlink(archive_path)
+    except FileNotFoundError:
+        pass
@@ -2,19 +2,76 @@ __version__ = '1.0.0b'
 
 import os
 import argparse
-from i18n import _
+from i18n import _, N_
 
-argument_parser = argparse.ArgumentParser('t6modm', description=_('A tool for creating and managing modding projects for Call of Duty: Black Ops 2'))
+class HelpFormatter(argparse.HelpFormatter):
+    # As ajudas ficam marcadas com N_ e só são traduzidas quando o --help for exibido
+    def _get_help_string(self, action: argparse.Action) -> str | None:
+        return _(action.help) if action.help else action.help
+
+    def _format_text(self, text: str) -> str:
+        return super()._format_text(_(text))
+
+argument_parser = argparse.ArgumentParser('t6modm', formatter_class=HelpFormatter, description=N_('A tool for creating and managing modding projects for Call of Duty: Black Ops 2'))
 argument_parser.add_argument('--version', action='version', version=f'T6MODM v{__version__}')
 subparsers = argument_parser.add_subparsers(title='command', dest='action', required=True)
 
-build_parser = subparsers.add_parser('build', help=_('Build the project'))
-build_parser.add_argument('--wait', action='store_true', default=False, help=_('Wait for manual review of the generated zonefile'))
-build_parser.add_argument('--target', choices=['debug', 'release'], default='debug', help=_('Build target'))
-build_parser.add_argument('--project-dir', default=os.getcwd(), help=_('The directory where the project is located'))
-build_parser.add_argument('--output-folder', help=_('The output directory'))
+TARGETS = ['debug', 'release']
+
+def target_list(value: str) -> list[str]:
+    # "debug,release" compila os dois alvos com uma única análise das zonas
+    targets: list[str] = []
+    for target in value.split(','):
+        target = target.strip()
+        if target not in TARGETS:
+            raise argparse.ArgumentTypeError(_('invalid target: %s (choose from %s)') % (target, ', '.join(TARGETS)))
+
+        if target not in targets:
+            targets.append(target)
+
+    return targets
+
+# Opções compartilhadas entre o build e o watch
+build_options = argparse.ArgumentParser(add_help=False)
+build_options.add_argument('--target', type=target_list, default=['debug'], help=N_('Build target, or a comma separated list of targets (debug,release)'))
+build_options.add_argument('--all-targets', dest='target', action='store_const', const=TARGETS, help=N_('Build every target, each one into its own output subfolder'))
+build_options.add_argument('--project-dir', default=os.getcwd(), help=N_('The directory where the project is located'))
+build_options.add_argument('--output-folder', help=N_('The output directory'))
+build_options.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help=N_('How many dependencies are parsed, and archive members compressed, in parallel'))
+build_options.add_argument('--define', '-D', metavar='NAME[=VALUE]', action='append', help=N_('Define a variable for the zone preprocessor (#if, ${NAME}), can be repeated'))
+build_options.add_argument('--split', action='store_true', default=False, help=N_('Link each dependency and zone group into its own fastfile, in parallel'))
+build_options.add_argument('--flatten', action='store_true', default=False, help=N_('Inline every included and dependency zone into a single generated zone, without temporary zones'))
+build_options.add_argument('--linker-jobs', type=int, help=N_('How many Linkers run at the same time (default: --jobs, up to 4)'))
+build_options.add_argument('--linker-timeout', metavar='SECONDS', type=float, help=N_('Stop the Linker if it takes longer than this'))
+
+build_parser = subparsers.add_parser('build', formatter_class=HelpFormatter, parents=[build_options], help=N_('Build the project'))
+build_parser.add_argument('--wait', action='store_true', default=False, help=N_('Wait for manual review of the generated zonefile'))
+build_parser.add_argument('--profile', metavar='FILE', help=N_('Write a Chrome trace-event file with the time spent on each build phase'))
+build_parser.add_argument('--force', action='store_true', default=False, help=N_('Rebuild the project even if nothing changed since the last build'))
+build_parser.add_argument('--no-daemon', action='store_true', default=False, help=N_('Build in this process even if a daemon is running'))
+
+watch_parser = subparsers.add_parser('watch', formatter_class=HelpFormatter, parents=[build_options], help=N_('Watch the project and rebuild it when something changes'))
+watch_parser.add_argument('--interval', type=float, default=0.5, help=N_('Polling interval in seconds, when inotify is not available'))
+watch_parser.add_argument('--debounce', type=float, default=0.3, help=N_('How many seconds without changes before rebuilding'))
+watch_parser.set_defaults(wait=False, force=False)
+
+check_parser = subparsers.add_parser('check', formatter_class=HelpFormatter, help=N_('Check every zone of the project and its dependencies without running the Linker'))
+check_parser.add_argument('--project-dir', default=os.getcwd(), help=N_('The directory where the project is located'))
+check_parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help=N_('How many zones are checked in parallel'))
+check_parser.add_argument('--define', '-D', metavar='NAME[=VALUE]', action='append', help=N_('Define a variable for the zone preprocessor (#if, ${NAME}), can be repeated'))
+check_parser.add_argument('--strict', action='store_true', default=False, help=N_('Fail on warnings too'))
+
+setup_parser = subparsers.add_parser('setup', formatter_class=HelpFormatter, help=N_('Setup the tool into your environment'))
+setup_parser.add_argument('--remove', action='store_true', default=os.getcwd(), help=N_('Remove the tool from your environment'))
+
+update_parser = subparsers.add_parser('update', formatter_class=HelpFormatter, help=N_('Update the tool'))
 
-setup_parser = subparsers.add_parser('setup', help=_('Setup the tool into your environment'))
-setup_parser.add_argument('--remove', action='store_true', default=os.getcwd(), help=_('Remove the tool from your environment'))
+daemon_parser = subparsers.add_parser('daemon', formatter_class=HelpFormatter, help=N_('Keep projects loaded in memory and run the builds sent by the other commands'))
+daemon_parser.add_argument('--stop', action='store_true', default=False, help=N_('Stop the running daemon'))
 
-update_parser = subparsers.add_parser('update', help=_('Update the tool'))
\ No newline at end of file
+cache_parser = subparsers.add_parser('cache', formatter_class=HelpFormatter, help=N_('Show or prune the cache shared by every project'))
+cache_subparsers = cache_parser.add_subparsers(title='command', dest='cache_action', required=True)
+cache_subparsers.add_parser('stats', formatter_class=HelpFormatter, help=N_('Show the hit rates and the disk usage of the shared cache'))
+prune_parser = cache_subparsers.add_parser('prune', formatter_class=HelpFormatter, help=N_('Remove the least recently used entries of the shared cache'))
+prune_parser.add_argument('--max-size', metavar='MB', type=float, help=N_('Size the cache is pruned down to (default: T6MODM_CACHE_SIZE or 1024 MB)'))
+prune_parser.add_argument('--all', action='store_true', default=False, help=N_('Remove every entry'))
\ No newline at end of file
@@ -0,0 +1,209 @@
+import os
+import re
+import glob
+import json
+import fnmatch
+from typing import Dict, List, Set, Tuple
+
+MAGIC = re.compile(r'[*?[]')
+
+class Directory:
+    __slots__ = ('mtime', 'names', 'dirs', 'keys')
+
+    def __init__(self, mtime: int, names: List[str], dirs: Set[str]):
+        self.mtime = mtime
+        self.names = names # Na ordem do os.scandir, assim como o glob.glob
+        self.dirs = dirs
+        self.keys = {os.path.normcase(name): name for name in names}
+
+def _is_hidden(name: str) -> bool:
+    return name[0] == '.'
+
+class AssetIndex:
+    def __init__(self, search_paths: List[str], exclude: List[str] | None = None):
+        self.search_paths = search_paths
+        self.exclude = [os.path.abspath(path) for path in (exclude or [])]
+        self.trees: Dict[str, Dict[str, Directory]] = {}
+        self.ready = False
+
+    def load(self, file_path: str) -> None:
+        try:
+            with open(file_path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        for search_path, tree in data.items():
+            self.trees[search_path] = {rel: Directory(mtime, names, set(dirs)) for rel, (mtime, names, dirs) in tree.items()}
+
+    def save(self, file_path: str) -> None:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump({
+                search_path: {rel: [directory.mtime, directory.names, list(directory.dirs)] for rel, directory in tree.items()}
+                for search_path, tree in self.trees.items()
+            }, file)
+
+    def refresh(self, jobs: int = 1) -> None:
+        def scan(search_path: str) -> Dict[str, Directory]:
+            tree: Dict[str, Directory] = {}
+            self._scan(search_path, '', self.trees.get(search_path, {}), tree)
+            return tree
+
+        # O scandir e o stat liberam o GIL, então cada pasta de assets pode ser lida numa thread
+        if jobs > 1 and len(self.search_paths) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=min(jobs, len(self.search_paths))) as executor:
+                trees = dict(zip(self.search_paths, executor.map(scan, self.search_paths)))
+        else:
+            trees = {search_path: scan(search_path) for search_path in self.search_paths}
+
+        self.trees = trees
+        self.ready = True
+
+    def _scan(self, path: str, rel: str, old: Dict[str, Directory], new: Dict[str, Directory]) -> None:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+
+        # Um diretório só é relido quando a data de modificação dele mudou (arquivos criados, removidos ou renomeados)
+        directory = old.get(rel)
+        if directory is None or directory.mtime != mtime:
+            names: List[str] = []
+            dirs: Set[str] = set()
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            if os.path.abspath(entry.path) in self.exclude:
+                                continue
+
+                            dirs.add(entry.name)
+
+                        names.append(entry.name)
+            except OSError:
+                return
+
+            directory = Directory(mtime, names, dirs)
+
+        new[rel] = directory
+        for name in directory.dirs:
+            self._scan(os.path.join(path, name), f'{rel}/{name}' if rel else name, old, new)
+
+    def _tree(self, search_path: str) -> Dict[str, Directory]:
+        if not self.ready:
+            self.refresh()
+
+        return self.trees.get(search_path, {})
+
+    def _lookup(self, tree: Dict[str, Directory], parts: List[str]) -> Tuple[str, bool] | None:
+        rel = ''
+        for index, part in enumerate(parts):
+            directory = tree.get(rel)
+            if directory is None:
+                return None
+
+            name = directory.keys.get(os.path.normcase(part))
+            if name is None:
+                return None
+
+            is_dir = name in directory.dirs
+            if index < len(parts) - 1 and not is_dir:
+                return None
+
+            rel = f'{rel}/{name}' if rel else name
+
+        return rel, rel in tree
+
+    def isfile(self, search_path: str, file_path: str) -> bool:
+        parts = [part for part in re.split(r'[\\/]', file_path) if part]
+        if search_path not in self.search_paths or len(parts) == 0 or '.' in parts or '..' in parts:
+            return os.path.isfile(os.path.join(search_path, file_path))
+
+        result = self._lookup(self._tree(search_path), parts)
+        return result is not None and not result[1]
+
+    def find(self, file_path: str) -> str | None:
+        for search_path in self.search_paths:
+            if self.isfile(search_path, file_path):
+                return search_path
+
+        return None
+
+    def glob(self, search_path: str, pattern: str) -> List[str]:
+        parts = re.split(r'[\\/]', pattern) if os.name == 'nt' else pattern.split('/')
+        parts = [part for part in parts[:-1] if part] + parts[-1:]
+        if search_path not in self.search_paths or os.path.isabs(pattern) or '.' in parts or '..' in parts:
+            return glob.glob(os.path.join(search_path, pattern), recursive=True)
+
+        tree = self._tree(search_path)
+
+        # Cada candidato é o caminho já montado e o diretório (relativo) que ele representa no índice
+        candidates: List[Tuple[str, str | None]] = [(search_path, '')]
+        for index, part in enumerate(parts):
+            last = index == len(parts) - 1
+            matches: List[Tuple[str, str | None]] = []
+
+            for path, rel in candidates:
+                directory = tree.get(rel) if rel is not None else None
+                if directory is None:
+                    continue
+
+                if part == '**':
+                    matches.append((os.path.join(path, ''), rel))
+                    self._walk(tree, path, rel, '', not last, matches)
+                    continue
+
+                if MAGIC.search(part):
+                    names = directory.names if _is_hidden(part) else [name for name in directory.names if not _is_hidden(name)]
+                    for name in fnmatch.filter(names, part):
+                        if name in directory.dirs:
+                            matches.append((os.path.join(path, name), f'{rel}/{name}' if rel else name))
+                        elif last:
+                            matches.append((os.path.join(path, name), None))
+
+                    continue
+
+                if len(part) == 0:
+                    # Padrões terminando com uma barra só encontram diretórios
+                    if last:
+                        matches.append((os.path.join(path, part), rel))
+
+                    continue
+
+                name = directory.keys.get(os.path.normcase(part))
+                if name is None:
+                    continue
+
+                if name in directory.dirs:
+                    matches.append((os.path.join(path, part), f'{rel}/{name}' if rel else name))
+                elif last:
+                    matches.append((os.path.join(path, part), None))
+
+            candidates = matches
+
+        return [path for path, _ in candidates]
+
+    def _walk(self, tree: Dict[str, Directory], path: str, rel: str, prefix: str, dironly: bool, matches: List[Tuple[str, str | None]]) -> None:
+        directory = tree.get(rel)
+        if directory is None:
+            return
+
+        for name in directory.names:
+            if _is_hidden(name):
+                continue
+
+            is_dir = name in directory.dirs
+            if dironly and not is_dir:
+                continue
+
+            name_path = os.path.join(prefix, name) if prefix else name
+            if not is_dir:
+                matches.append((os.path.join(path, name_path), None))
+                continue
+
+            child = f'{rel}/{name}' if rel else name
+            matches.append((os.path.join(path, name_path), child))
+            self._walk(tree, path, child, name_path, dironly, matches)
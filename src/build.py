@@ -0,0 +1,540 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import threading
+import subprocess
+
+from i18n import _
+from typing import TYPE_CHECKING, Dict, List, Set
+from concurrent.futures import ThreadPoolExecutor
+from colors import Colors
+from file import File
+from project import Project
+from exceptions import DependencyCycleException, DependencyNotFoundException, FileNotFoundException, IncludeCycleException, LinkerTimeoutException, ZonePreprocessorException
+from zone_ir import ZoneCache
+from zone_parser import FlatZoneWriter, MatrixZoneWriter, Test, ZoneParser, ZoneWriter, memory_zone_writer, open_zone_files, temp_zone_name
+from profiler import profiler
+from build_cache import BUILD, REPACKAGE, BuildCache, cache_folder, linker_path
+from staging import StagedOutput, replace_if_changed
+from preprocessor import parse_defines, zone_variables
+from fastfiles import Fastfile, FastfileState, fastfile_keys, split_fastfiles, write_manifest
+from tests.files import files
+from tests.filter_gsc import filter_gsc
+from tests.include_zone import include_zone
+from tests.filter_headers import filter_headers
+from tests.ignore_comments import ignore_comments
+
+if TYPE_CHECKING:
+    from linker import LinkerEvent
+
+def load_project(project_dir: str) -> Project:
+    file_path = os.path.join(project_dir, 'project.t6modm.json')
+
+    try:
+        return Project.from_file(file_path)
+    except FileNotFoundException:
+        message = _('That is not a project!')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message}')
+        sys.exit(1)
+    except DependencyCycleException as err:
+        message = _('Dependency cycle detected, a project depends on itself:')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message}')
+        for home in err.chain:
+            print(f'↳   {home}')
+
+        sys.exit(1)
+    except DependencyNotFoundException as err:
+        message = _('The dependency %(spec)s does not exist (%(home)s), declared in %(project)s.')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % {'spec': err.spec, 'home': err.home, 'project': err.declared_by}}')
+        sys.exit(1)
+
+def output_folder_of(project: Project, args: argparse.Namespace, target: str | None = None) -> str:
+    output_folder = args.output_folder if args.output_folder is not None else os.path.join(project.home, 'compiled')
+
+    # Com vários alvos, cada um vai para a sua própria subpasta
+    if target is not None and len(args.target) > 1:
+        output_folder = os.path.join(output_folder, target)
+
+    return output_folder
+
+def parse_dependency(project: Project, dependency_zone_path: str, tests: List[Test]) -> str:
+    dependency_parser = ZoneParser(dependency_zone_path)
+    dependency_parser.project = project
+    dependency_parser.tests = tests
+
+    dependency_temp_name = temp_zone_name(dependency_zone_path)
+    dependency_temp_paths = {target: f'{project.temp_zone_path(dependency_temp_name, target)}.zone' for target in project.targets}
+    with profiler.span('parse dependency', path=dependency_zone_path):
+        with open_zone_files(dependency_temp_paths) as dependency_temp_file:
+            dependency_parser.parse(dependency_temp_file)
+
+    return dependency_temp_name
+
+def flatten_dependency(project: Project, dependency_zone_path: str, tests: List[Test]) -> ZoneWriter | MatrixZoneWriter:
+    # No --flatten a dependência fica na memória até entrar na zona gerada, na ordem das dependências
+    dependency_parser = ZoneParser(dependency_zone_path)
+    dependency_parser.project = project
+    dependency_parser.tests = tests
+
+    output = memory_zone_writer(project.targets)
+    with profiler.span('parse dependency', path=dependency_zone_path):
+        dependency_parser.parse(output)
+
+    return output
+
+def print_linker_event(event: 'LinkerEvent', label: str = '') -> None:
+    if event.kind == 'error':
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {label}{event.line}')
+    elif event.kind == 'warning':
+        print(f'[{Colors.YELLOW}WARN{Colors.RESET}] {label}{event.line}')
+    else:
+        print(f'{label}{event.line}')
+
+def linker_command(project: Project, output_folder: str, zone: str) -> List[str]:
+    command = [
+        linker_path(),
+        '-v',
+        '--output-folder', output_folder,
+        '--base-folder', os.environ.get('OAT_HOME', ''),
+        '--source-search-path', os.path.join(project.home, 'src', 'zone_source'),
+        '--add-asset-search-path', os.path.join(project.home, 'src'),
+        '--add-asset-search-path', os.path.join(os.environ.get('GAME_HOME', ''), 'zone', 'all'),
+        '--add-asset-search-path', os.path.join(os.environ.get('GAME_HOME', ''), 'zone', 'english'),
+    ]
+
+    for fastfile in project.fastfiles:
+        command.append('--load')
+        command.append(fastfile.replace('$GAME_HOME', os.environ.get('GAME_HOME', '')).replace('$HOME', project.home))
+
+    for dependency in project.dependency_graph.search_order:
+        command.append('--add-asset-search-path')
+        command.append(dependency.source_folder)
+
+    command.append(zone)
+    return command
+
+def build_project(project: Project, args: argparse.Namespace) -> None:
+    if os.environ.get('OAT_HOME') is None:
+        message = _('The environment variable %s is not defined. You can define on a .t6modm.env file!')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % 'OAT_HOME'}')
+        sys.exit(1)
+
+    if os.environ.get('GAME_HOME') is None:
+        message = _('The environment variable %s is not defined. You can define on a .t6modm.env file!')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % 'GAME_HOME'}')
+        sys.exit(1)
+
+    source_path = os.path.join(project.home, 'src', 'zone_source', 'mod.zone')
+    if not os.path.isfile(source_path):
+        message = _('The file %s does not exist.')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % source_path}')
+        sys.exit(1)
+
+    targets: List[str] = args.target
+
+    # Variáveis das zonas, calculadas uma vez por build para cada alvo
+    project.defines = parse_defines(args.define)
+    project.variables = {target: zone_variables(project, target) for target in targets}
+    project.used_variables = set()
+    project.conditions = {}
+
+    # O split pode vir do project.t6modm.json ou da linha de comando
+    project.split = project.split or args.split
+    project.group_includes = {}
+    project.flatten = args.flatten
+
+    if project.split and project.flatten:
+        message = _('--split and --flatten cannot be used together.')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message}')
+        sys.exit(1)
+
+    # Com um único alvo o próprio projeto recebe os arquivos (o watch usa essa lista depois), com vários cada alvo tem uma cópia
+    if len(targets) == 1:
+        project.target = targets[0]
+        variants = {project.target: project}
+    else:
+        variants = {target: project.variant(target) for target in targets}
+
+    with profiler.span('check build cache'):
+        build_caches = {target: BuildCache(project, output_folder_of(project, args, target), target) for target in targets}
+        build_caches[targets[0]].collect_inputs()
+        for target in targets[1:]:
+            build_caches[target].inputs = build_caches[targets[0]].inputs # As entradas são as mesmas para todos os alvos
+        statuses = {target: build_cache.status() for target, build_cache in build_caches.items()}
+    if not args.force and not args.wait and BUILD not in statuses.values():
+        for target, build_cache in build_caches.items():
+            build_cache.restore(variants[target])
+            if statuses[target] != REPACKAGE:
+                build_cache.save(variants[target], refresh_outputs=False)
+                continue
+
+            # Só mudaram arquivos que vão apenas para o IWD/zip: as zonas não são analisadas e o Linker não roda
+            label = f'{target}: ' if len(targets) > 1 else ''
+            message = _('Only files that go to the archives changed, repackaging...')
+            print(f'[{Colors.GREEN}INFO{Colors.RESET}] {label}{message}')
+            with profiler.span('package', target=target):
+                package_project(variants[target], build_cache.output_folder, args.jobs)
+
+            build_cache.save(variants[target])
+
+        if REPACKAGE not in statuses.values():
+            message = _('Nothing changed since the last build, the project is up to date.')
+            print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message}')
+
+        return
+
+    stale_outputs = previous_layout_outputs(project, args)
+    for build_cache in build_caches.values():
+        build_cache.invalidate()
+
+    asset_index_path = os.path.join(cache_folder(project), 'asset-index.json')
+    with profiler.span('asset index'):
+        # No daemon o índice continua na memória entre os builds, só precisa ser atualizado
+        if not project.asset_index.ready:
+            project.asset_index.load(asset_index_path)
+
+        project.asset_index.refresh(args.jobs)
+        project.asset_index.save(asset_index_path)
+
+    if project.zone_cache is None:
+        project.zone_cache = ZoneCache(os.path.join(cache_folder(project), 'zones'))
+
+    # As zonas são analisadas uma única vez para todos os alvos, os arquivos de cada alvo saem do diário dessa análise
+    parsed = project.fork()
+    parsed.targets = targets
+
+    parser = ZoneParser(source_path)
+    parser.project = parsed
+
+    # Abaixo estão os testes que serão executados para cada linha
+    # A ordem dos fatores importa!
+    parser.tests.append(ignore_comments) # 1
+    parser.tests.append(filter_headers)  # 2
+    parser.tests.append(filter_gsc)      # 3
+    parser.tests.append(include_zone)    # 4
+    parser.tests.append(files)           # 5
+
+    zone_source = os.path.join(project.home, 'src', 'zone_source')
+    output_paths = {target: f'{parsed.temp_zone_path('mod', target)}.zone' for target in targets}
+    for output_path in output_paths.values():
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    try:
+        with profiler.span('parse'):
+            with open_zone_files(output_paths) as output_file:
+                output_files = output_file if isinstance(output_file, dict) else {targets[0]: output_file}
+                for target_file in output_files.values():
+                    target_file.write('>game,T6\n')
+                    target_file.write('>name,mod\n')
+
+                # No --flatten as zonas incluídas e as dependências são escritas aqui mesmo, cada asset uma única vez
+                output = output_file
+                if project.flatten:
+                    output = MatrixZoneWriter(output_file, FlatZoneWriter) if isinstance(output_file, dict) else FlatZoneWriter(output_file)
+
+                parser.parse(output)
+
+                dependencies = [dependency for dependency in project.dependency_graph.order if os.path.isfile(dependency.zone_path)]
+                temp_names = {'mod'}
+                dependency_temp_names = []
+
+                # A análise de uma dependência não depende das outras, então todas são analisadas ao mesmo tempo, cada uma numa cópia do projeto.
+                # As alterações são aplicadas na ordem topológica: as dependências de uma dependência vêm antes dela e os arquivos dela têm prioridade.
+                forks = [parsed.fork() for _dependency in dependencies]
+                with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+                    parse = flatten_dependency if project.flatten else parse_dependency
+                    futures = [executor.submit(parse, fork, dependency.zone_path, parser.tests.copy()) for fork, dependency in zip(forks, dependencies)]
+
+                    for dependency, fork, future in zip(dependencies, forks, futures):
+                        if project.flatten:
+                            dependency_output = future.result()
+                            parsed.merge(fork)
+                            parser.output.append(f'// >>> Dependency: {dependency.name} ({dependency.zone_path})')
+                            parser.output.extend(dependency_output)
+                            parser.output.append(f'// <<< Dependency: {dependency.name}')
+                            continue
+
+                        dependency_temp_name = future.result()
+                        temp_names.add(dependency_temp_name)
+                        dependency_temp_names.append((dependency, dependency_temp_name))
+                        parsed.merge(fork)
+
+                        # Com o split cada dependência vira o seu próprio fastfile, fora do mod.ff
+                        if project.split:
+                            continue
+
+                        for target, target_file in output_files.items():
+                            include_path = os.path.relpath(parsed.temp_zone_path(dependency_temp_name, target), zone_source).replace(os.sep, '/')
+                            target_file.write('\n// Dependency: ' + dependency.name + '\n')
+                            target_file.write(f'include,{include_path}\n')
+
+    except IncludeCycleException as err:
+        message = _('Include cycle detected, a zone includes itself:')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message}')
+        for zone_path in err.chain:
+            print(f'↳   {zone_path}')
+
+        sys.exit(1)
+    except ZonePreprocessorException as err:
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {err.source}:{err.line_number}: {err.message}')
+        sys.exit(1)
+
+    for target, variant in variants.items():
+        variant.merge(parsed, target)
+
+    # Fastfiles de cada alvo, na ordem de carregamento. Sem o split é só o mod.ff.
+    fastfiles: Dict[str, List[Fastfile]] = {}
+    for target in targets:
+        if project.split:
+            fastfiles[target] = split_fastfiles(parsed, dependency_temp_names, target)
+        else:
+            fastfiles[target] = [Fastfile('mod', output_paths[target], [])]
+
+        temp_names.update(fastfile.name for fastfile in fastfiles[target])
+
+    temp_names.update(parsed.included_zones.values())
+    prune_tempzones(parsed, temp_names)
+
+    if args.wait:
+        for output_path in output_paths.values():
+            code_path = shutil.which('code')
+            if code_path:
+                code = subprocess.Popen([code_path, '--wait', output_path])
+                code.wait()
+
+            if code_path is None:
+                notepad_path = shutil.which('notepad')
+                if notepad_path is None:
+                    message = _('Failed to locate VSCode and Notepad on your system.')
+                    print(f'[{Colors.RED}ERR!{Colors.RESET}] {message}')
+                    sys.exit(1)
+
+                notepad = subprocess.Popen([notepad_path, output_path])
+                notepad.wait()
+
+    for target, variant in variants.items():
+        label = f'{target}: ' if len(targets) > 1 else ''
+        if len(variant.filtered_scripts) == 0:
+            message = _('No scripts filtered.')
+            print(f'[{Colors.GREEN}INFO{Colors.RESET}] {label}{message}')
+        else:
+            message = _('%(amount)s %(noun)s filtered.')
+            print(f'[{Colors.GREEN}INFO{Colors.RESET}] {label}{message % {'amount': len(variant.filtered_scripts), 'noun': 'script' if len(variant.filtered_scripts) < 2 else 'scripts'}}')
+
+    # Quantos Linkers rodam ao mesmo tempo, somando todos os alvos
+    slots = threading.BoundedSemaphore(max(1, args.linker_jobs if args.linker_jobs is not None else min(args.jobs, 4)))
+
+    # Os Linkers e o empacotamento de cada alvo rodam ao mesmo tempo quando há núcleos sobrando
+    if len(targets) == 1 or args.jobs < 2:
+        for target in targets:
+            link_project(variants[target], build_caches[target], fastfiles[target], args, slots)
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(targets), args.jobs)) as executor:
+            futures = [executor.submit(link_project, variants[target], build_caches[target], fastfiles[target], args, slots) for target in targets]
+            for future in futures:
+                future.result()
+
+    # Só depois de todos os alvos darem certo, um build que falha deixa a saída anterior inteira
+    for path in stale_outputs:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def previous_layout_outputs(project: Project, args: argparse.Namespace) -> List[str]:
+    # Com vários alvos cada um vai para uma subpasta. O que um build de um único alvo deixou direto na pasta de saída
+    # (mod.ff, mod.iwd...) sai quando o layout muda. No sentido contrário o commit da pasta de staging já remove as subpastas.
+    if len(args.target) < 2:
+        return []
+
+    folder = cache_folder(project)
+    if not os.path.isdir(folder):
+        return []
+
+    output_folder = os.path.normcase(os.path.abspath(output_folder_of(project, args)))
+    stale: List[str] = []
+    for name in os.listdir(folder):
+        if not (name.startswith('build-') and name.endswith('.json')):
+            continue
+
+        try:
+            with open(os.path.join(folder, name), 'r') as file:
+                outputs = json.load(file).get('outputs', {})
+        except (OSError, ValueError):
+            continue
+
+        stale.extend(path for path in outputs if os.path.normcase(os.path.dirname(os.path.abspath(path))) == output_folder and os.path.isfile(path))
+
+    return stale
+
+def prune_tempzones(project: Project, names: Set[str]) -> None:
+    # As zonas temporárias não são apagadas antes do build, só as que este build não gerou (zonas removidas ou alteradas) saem
+    root = os.path.join(project.home, 'src', 'zone_source', 'tempzones')
+    folders = {os.path.dirname(project.temp_zone_path('mod', target)) for target in project.targets}
+    for path, _dirs, names_in_folder in os.walk(root, topdown=False):
+        for name in names_in_folder:
+            stem, extension = os.path.splitext(name)
+            if path not in folders or extension != '.zone' or stem not in names:
+                try:
+                    os.unlink(os.path.join(path, name))
+                except OSError:
+                    pass
+
+        if path not in folders and path != root:
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+
+def link_project(project: Project, build_cache: BuildCache, fastfiles: List[Fastfile], args: argparse.Namespace, slots: threading.BoundedSemaphore) -> None:
+    # O asyncio só é carregado quando o Linker realmente precisa rodar, um build sem alterações não paga por ele
+    from linker import run_linker
+
+    output_folder = build_cache.output_folder
+    label = f'{project.target}: ' if len(args.target) > 1 else ''
+    zone_source = os.path.join(project.home, 'src', 'zone_source')
+
+    # O build é montado numa pasta ao lado da saída, que continua intacta até o fim (o cache fica onde está)
+    # ! IMPORTANTE: O diretório de saída deve existir antes de chamar o Linker (ele cria automaticamente se não existir, mas existe um bug com soundbanks caso não exista, a compilação funciona, mas o OAT diz que falhou)
+    staged = StagedOutput(output_folder, keep=[cache_folder(project)])
+    staged.create()
+
+    commands = {fastfile.name: linker_command(project, staged.folder, os.path.relpath(os.path.splitext(fastfile.zone_path)[0], zone_source)) for fastfile in fastfiles}
+
+    message = _('Building the project for target %s...')
+    print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % project.target}')
+
+    failed = threading.Event()
+
+    def link(fastfile: Fastfile) -> bool:
+        command = commands[fastfile.name]
+        fastfile_label = f'{label}{fastfile.name}: ' if project.split else label
+        with slots:
+            if failed.is_set():
+                return False # Outro fastfile já falhou, não adianta rodar mais um Linker
+
+            try:
+                with profiler.span('link', target=project.target, fastfile=fastfile.name, command=command):
+                    returncode = run_linker(command, args.linker_timeout, lambda event: print_linker_event(event, fastfile_label))
+            except LinkerTimeoutException as err:
+                failed.set()
+                message = _('The Linker did not finish in %s seconds and was stopped.')
+                print(f'[{Colors.RED}ERR!{Colors.RESET}] {fastfile_label}{message % err.timeout}')
+                return False
+            except FileNotFoundError:
+                failed.set()
+                message = _('The file %s does not exist.')
+                print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % command[0]}')
+                return False
+
+        if returncode != 0:
+            failed.set()
+            message = _('Build failed!')
+            print(f'[{Colors.RED}ERR!{Colors.RESET}] {fastfile_label}{message}')
+            return False
+
+        return True
+
+    try:
+        keys: Dict[str, str] = {}
+        pending = fastfiles
+        if project.split:
+            # Um fastfile cuja zona e arquivos não mudaram vem da saída anterior, sem rodar o Linker
+            keys = fastfile_keys(project, fastfiles, commands, build_cache.inputs)
+            state = FastfileState(os.path.join(cache_folder(project), f'fastfiles-{project.target}.json'))
+            if not args.force:
+                pending = [fastfile for fastfile in fastfiles if not state.reuse(fastfile.name, keys[fastfile.name], output_folder, staged.folder)]
+
+            if len(pending) < len(fastfiles):
+                message = _('%(reused)s of %(total)s fastfiles unchanged, reused from the last build.')
+                print(f'[{Colors.GREEN}INFO{Colors.RESET}] {label}{message % {'reused': len(fastfiles) - len(pending), 'total': len(fastfiles)}}')
+
+        if len(pending) == 1:
+            results = [link(pending[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+                results = list(executor.map(link, pending))
+
+        if not all(results):
+            sys.exit(1)
+
+        message = _('Build completed successfully!')
+        print(f'[{Colors.GREEN}INFO{Colors.RESET}] {label}{message}')
+
+        if project.split:
+            write_manifest(staged.folder, fastfiles)
+
+        with profiler.span('package', target=project.target):
+            package_project(project, output_folder, args.jobs, staged)
+
+        if project.split:
+            state.save(keys)
+    finally:
+        staged.discard()
+
+    build_cache.save(project, zone_paths=[fastfile.zone_path for fastfile in fastfiles])
+
+def package_project(project: Project, output_folder: str, jobs: int, staged: StagedOutput | None = None) -> None:
+    from archive import ArchiveState, remove_archive, write_archive
+
+    archive_state = ArchiveState(os.path.join(cache_folder(project), f'archives-{project.target}.json'))
+
+    # Sem uma pasta de staging (o watch reempacotando) os arquivos vão direto para a saída
+    folder = staged.folder if staged is not None else output_folder
+
+    files: List[File] = list(project.files)
+    serverfiles: List[File] = [*project.serverfiles, *project.filtered_scripts]
+    if project.minify and project.target == 'release':
+        from minify import minify_scripts
+
+        with profiler.span('minify'):
+            minified = minify_scripts(files + serverfiles, os.path.join(cache_folder(project), 'minified'), jobs)
+
+        files, serverfiles = minified[:len(files)], minified[len(files):]
+
+    archives = {}
+
+    iwd_path = os.path.join(output_folder, 'mod.iwd')
+    if len(files) > 0:
+        with profiler.span('archive', archive='mod.iwd', members=len(files)):
+            archives[iwd_path] = write_archive(iwd_path, files, archive_state, project.compression, jobs, os.path.join(folder, 'mod.iwd'))
+
+        message = _('Created %s')
+        print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % 'mod.iwd'}')
+
+    zip_path = os.path.join(output_folder, 'server-only.zip')
+    if len(serverfiles) > 0:
+        with profiler.span('archive', archive='server-only.zip', members=len(serverfiles)):
+            archives[zip_path] = write_archive(zip_path, serverfiles, archive_state, project.compression, jobs, os.path.join(folder, 'server-only.zip'))
+
+        message = _('Created %s')
+        print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % 'server-only.zip'}')
+
+    manifest_path = os.path.join(folder, 'mod.json')
+    with open(f'{manifest_path}.partial', 'w') as manifest_file:
+        json.dump({
+            'name': project.name,
+            'description': project.description,
+            'version': project.version,
+            'author': project.author
+        }, manifest_file, indent=4, ensure_ascii=False)
+
+    replace_if_changed(f'{manifest_path}.partial', manifest_path)
+
+    if staged is not None:
+        with profiler.span('sync output', target=project.target):
+            changed, unchanged, removed = staged.commit()
+
+        message = _('Output updated: %(changed)s changed, %(unchanged)s unchanged, %(removed)s removed.')
+        print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % {'changed': changed, 'unchanged': unchanged, 'removed': removed}}')
+
+    # O estado aponta para os arquivos no lugar final, que só agora estão lá
+    for archive_path in (iwd_path, zip_path):
+        if archive_path in archives:
+            archive_state.update(archive_path, archives[archive_path])
+        else:
+            remove_archive(archive_path, archive_state)
+
+    archive_state.save()
@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Set, Tuple
+from file import File
+from project import Project
+from argument_parser import __version__
+
+CACHE_FOLDER = '.t6modm-cache'
+
+Fingerprint = Tuple[int, int, str] # (tamanho, mtime_ns, sha1)
+
+# Resultado da verificação do cache: nada a fazer, só empacotar de novo (o Linker não precisa rodar) ou compilar tudo
+UP_TO_DATE = 'up-to-date'
+REPACKAGE = 'repackage'
+BUILD = 'build'
+
+def cache_folder(project: Project) -> str:
+    return os.path.join(project.home, 'compiled', CACHE_FOLDER)
+
+def linker_path() -> str:
+    # T6MODM_LINKER troca o Linker do OAT por outro programa (um Linker falso para testar o build no Linux, por exemplo)
+    linker = os.environ.get('T6MODM_LINKER')
+    if linker:
+        return linker
+
+    return os.path.join(os.environ.get('OAT_HOME', ''), 'Linker.exe' if os.name == 'nt' else 'Linker')
+
+def file_fingerprint(path: str, previous: Dict[str, Fingerprint]) -> Fingerprint | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    # Só calcula o hash do conteúdo quando o tamanho ou a data de modificação mudaram
+    old = previous.get(path)
+    if old is not None and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+        return old
+
+    with open(path, 'rb') as file:
+        digest = hashlib.file_digest(file, 'sha1').hexdigest()
+
+    return (stat.st_size, stat.st_mtime_ns, digest)
+
+def archive_only_paths(project: Project, zone_paths: List[str]) -> List[str]:
+    # Arquivos que vão para o IWD/zip e que nenhuma zona cita pelo caminho, o Linker nunca lê esses arquivos
+    from fastfiles import matching_references, referenced_paths, zone_text
+
+    zone_source = os.path.join(project.home, 'src', 'zone_source')
+    referenced: Set[str] = set()
+    for zone_path in zone_paths:
+        referenced.update(referenced_paths(zone_text(zone_path, zone_source)))
+
+    patterns = [reference for reference in referenced if '*' in reference]
+
+    search_paths = [os.path.join(os.path.abspath(search_path), '') for search_path in project.asset_search_path]
+    paths: Set[str] = set()
+    for file in [*project.files, *project.serverfiles, *project.filtered_scripts]:
+        source = os.path.abspath(file.source)
+        search_path = next((search_path for search_path in search_paths if source.startswith(search_path)), None)
+        if search_path is not None and len(matching_references(os.path.normcase(os.path.relpath(source, search_path).replace(os.sep, '/')), referenced, patterns)) > 0:
+            continue
+
+        paths.add(source)
+
+    return sorted(paths)
+
+def walk_files(root: str, exclude: List[str]):
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if os.path.abspath(entry.path) not in exclude:
+                yield from walk_files(entry.path, exclude)
+
+            continue
+
+        yield entry.path
+
+class BuildCache:
+    def __init__(self, project: Project, output_folder: str, target: str):
+        self.project = project
+        self.output_folder = output_folder
+        self.target = target
+        self.path = os.path.join(cache_folder(project), f'build-{target}.json') # Um cache por alvo, assim alternar entre eles não invalida o outro
+        self.key = self._make_key()
+        self.inputs: Dict[str, Fingerprint] = {}
+        self.outputs: Dict[str, Fingerprint] = {}
+        self.previous_key: str | None = None
+        self.previous_inputs: Dict[str, Fingerprint] = {}
+        self.previous_outputs: Dict[str, Fingerprint] = {}
+        self.previous_files: Dict[str, List[List[str]]] = {}
+        self.previous_variables: Dict[str, str | None] = {}
+        self.previous_archived: Set[str] = set()
+
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, 'r') as file:
+                    data = json.load(file)
+
+                self.previous_key = data.get('key')
+                self.previous_inputs = {path: tuple(value) for path, value in data.get('inputs', {}).items()}
+                self.previous_outputs = {path: tuple(value) for path, value in data.get('outputs', {}).items()}
+                self.previous_files = data.get('files', {})
+                self.previous_variables = data.get('variables', {})
+                self.previous_archived = set(data.get('archived', []))
+            except (OSError, ValueError):
+                pass # Um cache corrompido apenas força uma compilação completa
+
+    def _make_key(self) -> str:
+        oat_home = os.environ.get('OAT_HOME', '')
+        game_home = os.environ.get('GAME_HOME', '')
+        return json.dumps([__version__, self.target, os.path.abspath(self.output_folder), oat_home, game_home, linker_path(), self.project.split, self.project.flatten])
+
+    def _input_paths(self):
+        project_file = os.path.join(self.project.home, 'project.t6modm.json')
+        yield project_file
+
+        yield linker_path()
+
+        # Dependências indiretas vêm dos project.t6modm.json das dependências
+        yield from self.project.dependency_graph.project_files()
+
+        for fastfile in self.project.fastfiles:
+            yield fastfile.replace('$GAME_HOME', os.environ.get('GAME_HOME', '')).replace('$HOME', self.project.home)
+
+        # Zonas, zonas incluídas, scripts e assets vivem dentro dos caminhos de busca
+        exclude = [os.path.abspath(os.path.join(self.project.home, 'src', 'zone_source', 'tempzones'))]
+        for search_path in self.project.asset_search_path:
+            yield from walk_files(search_path, exclude)
+
+    def _output_paths(self):
+        yield from walk_files(self.output_folder, [os.path.abspath(cache_folder(self.project))])
+
+    def collect_inputs(self) -> None:
+        self.inputs = {}
+        for path in self._input_paths():
+            fingerprint = file_fingerprint(path, self.previous_inputs)
+            if fingerprint is not None:
+                self.inputs[path] = fingerprint
+
+    def status(self) -> str:
+        if self.previous_key != self.key or len(self.previous_outputs) == 0:
+            return BUILD
+
+        # Um arquivo novo ou apagado pode mudar o que um file: encontra, então as zonas são analisadas de novo
+        if self.inputs.keys() != self.previous_inputs.keys():
+            return BUILD
+
+        # Compara apenas o conteúdo, um arquivo "tocado" sem alterações não força uma nova compilação
+        changed = [path for path, fingerprint in self.inputs.items() if fingerprint[2] != self.previous_inputs[path][2]]
+        if any(path not in self.previous_archived for path in changed):
+            return BUILD
+
+        # Variáveis usadas pelas zonas (ambiente, -D) com outro valor mudam o resultado do pré-processador
+        variables = self.project.variables.get(self.target, {})
+        for name, value in self.previous_variables.items():
+            if variables.get(name) != value:
+                return BUILD
+
+        for path in self._output_paths():
+            if path not in self.previous_outputs:
+                return BUILD
+
+        for path, fingerprint in self.previous_outputs.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return BUILD
+
+            if stat.st_size != fingerprint[0] or stat.st_mtime_ns != fingerprint[1]:
+                return BUILD
+
+        # Só mudaram arquivos que vão apenas para o IWD/zip, o resultado do Linker continua valendo
+        return REPACKAGE if len(changed) > 0 else UP_TO_DATE
+
+    def is_up_to_date(self) -> bool:
+        return self.status() == UP_TO_DATE
+
+    def restore(self, project: Project) -> None:
+        # Quando nada mudou, os arquivos do IWD e do server-only.zip voltam do cache (usado pelo watch)
+        for source, dest in self.previous_files.get('files', []):
+            project.files.add(source, dest)
+
+        for source, dest in self.previous_files.get('serverfiles', []):
+            project.serverfiles.add(source, dest)
+
+        for source, dest in self.previous_files.get('filtered_scripts', []):
+            project.filtered_scripts.append(File(source, dest))
+
+    def save(self, project: Project, refresh_outputs: bool = True, zone_paths: List[str] | None = None) -> None:
+        # As variáveis usadas e os arquivos que só vão para o IWD/zip só mudam quando as zonas (zone_paths) foram analisadas
+        variables = self.previous_variables
+        archived = sorted(self.previous_archived)
+        if zone_paths is not None:
+            base = self.project.variables.get(self.target, {})
+            variables = {name: base.get(name) for name in sorted(self.project.used_variables)}
+            archived = archive_only_paths(project, zone_paths)
+
+        self.outputs = self.previous_outputs
+        if refresh_outputs:
+            self.outputs = {}
+            for path in self._output_paths():
+                stat = os.stat(path)
+                self.outputs[path] = (stat.st_size, stat.st_mtime_ns, '')
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as file:
+            json.dump({
+                'key': self.key,
+                'inputs': self.inputs,
+                'outputs': self.outputs,
+                'variables': variables,
+                'archived': archived,
+                'files': {
+                    'files': [[file.source, file.dest] for file in project.files],
+                    'serverfiles': [[file.source, file.dest] for file in project.serverfiles],
+                    'filtered_scripts': [[file.source, file.dest] for file in project.filtered_scripts]
+                }
+            }, file)
+
+    def invalidate(self) -> None:
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
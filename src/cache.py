@@ -0,0 +1,41 @@
+from i18n import _
+from colors import Colors
+from shared_cache import KINDS, default_folder, default_max_size, entries, prune, read_stats
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+
+        size /= 1024
+
+    return f'{size:.1f} GB'
+
+def cache_stats():
+    folder = default_folder()
+    stats = read_stats(folder)
+    found = entries(folder)
+
+    message = _('Shared cache at %s')
+    print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % folder}')
+
+    total = sum(size for _mtime, size, _kind, _path in found)
+    for kind in KINDS:
+        hits = stats.get(f'{kind}.hits', 0)
+        misses = stats.get(f'{kind}.misses', 0)
+        size = sum(entry[1] for entry in found if entry[2] == kind)
+        count = sum(1 for entry in found if entry[2] == kind)
+        hit_rate = f'{hits / (hits + misses) * 100:.1f}%' if hits + misses > 0 else '-'
+        message = _('%(kind)-8s %(entries)8s entries %(size)12s   %(hits)s hits, %(misses)s misses (%(hit_rate)s)')
+        print(message % {'kind': kind, 'entries': count, 'size': format_size(size), 'hits': hits, 'misses': misses, 'hit_rate': hit_rate})
+
+    message = _('Total: %(size)s of %(max_size)s')
+    print(message % {'size': format_size(total), 'max_size': format_size(default_max_size())})
+
+def cache_prune(max_size: float | None, everything: bool):
+    folder = default_folder()
+    limit = 0 if everything else int(max_size * 1024 * 1024) if max_size is not None else default_max_size()
+    removed, removed_size = prune(folder, limit)
+
+    message = _('%(entries)s entries removed, %(size)s freed.')
+    print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % {'entries': removed, 'size': format_size(removed_size)}}')
@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import argparse
+from i18n import _
+from typing import Dict, List, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from colors import Colors
+from project import Project
+from zone_ir import ASSET_FILES, Asset, Comment, Directive, FileStatement, Include, Line, Script, ZoneCache, parse_line
+from build_cache import cache_folder
+from preprocessor import compile_condition, parse_defines, substitute, zone_variables
+
+# Tipos de asset do T6 aceitos pelo Linker, qualquer outro é provavelmente um erro de digitação (scirpt,...)
+ASSET_TYPES = frozenset([
+    'physpreset', 'physconstraints', 'destructibledef', 'xanim', 'xmodel', 'material', 'techniqueset', 'image',
+    'soundbank', 'sound', 'soundpatch', 'clipmap', 'clipmap_pvs', 'comworld', 'gameworldsp', 'gameworldmp', 'mapents',
+    'gfxworld', 'gfxlightdef', 'lightdef', 'font', 'fonticon', 'menulist', 'menu', 'localize', 'weapon', 'weapondef',
+    'weaponvariant', 'weaponfull', 'attachment', 'attachmentunique', 'camo', 'snddriverglobals', 'fx', 'fximpacttable',
+    'impactfx', 'aitype', 'mptype', 'mpbody', 'mphead', 'character', 'xmodelalias', 'rawfile', 'stringtable',
+    'leaderboard', 'xglobals', 'ddl', 'glasses', 'emblemset', 'script', 'scriptparsetree', 'keyvaluepairs', 'vehicle',
+    'memoryblock', 'addonmapents', 'tracer', 'skinnedverts', 'qdb', 'slug', 'footsteptable', 'footstepfxtable', 'zbarrier',
+])
+
+class Problem:
+    __slots__ = ('severity', 'path', 'line_number', 'message')
+
+    def __init__(self, severity: str, path: str, line_number: int | None, message: str):
+        self.severity = severity # error ou warning
+        self.path = path
+        self.line_number = line_number
+        self.message = message
+
+    @property
+    def location(self) -> str:
+        return self.path if self.line_number is None else f'{self.path}:{self.line_number}'
+
+class ZoneReport:
+    __slots__ = ('problems', 'includes')
+
+    def __init__(self):
+        self.problems: List[Problem] = []
+        self.includes: List[Tuple[str, int]] = [] # (zona incluída, linha do include)
+
+def _exists(project: Project, pattern: str) -> bool:
+    return any(len(project.asset_index.glob(search_path, pattern)) > 0 for search_path in project.asset_search_path)
+
+def check_directive(report: ZoneReport, zone_path: str, line_number: int, row: Tuple, conditions: List[int], defined: Dict[str, str]) -> None:
+    # Os dois lados de cada #if são verificados, então só a sintaxe e o balanceamento importam aqui
+    name, argument = row[2], row[3]
+    try:
+        if name in ('if', 'elif'):
+            compile_condition(argument)
+        elif name in ('ifdef', 'ifndef'):
+            compile_condition(f'defined({argument})')
+    except ValueError as err:
+        report.problems.append(Problem('error', zone_path, line_number, str(err)))
+
+    if name in ('if', 'ifdef', 'ifndef'):
+        conditions.append(line_number)
+    elif name in ('elif', 'else', 'endif'):
+        if len(conditions) == 0:
+            report.problems.append(Problem('error', zone_path, line_number, _('#%s without #if') % name))
+        elif name == 'endif':
+            conditions.pop()
+    elif name == 'define':
+        variable, _separator, value = argument.partition(' ')
+        defined[variable] = value.strip() or '1'
+    elif name != 'undef':
+        report.problems.append(Problem('error', zone_path, line_number, _('unknown directive: #%s') % name))
+
+def check_zone(project: Project, zone_cache: ZoneCache, zone_path: str) -> ZoneReport:
+    report = ZoneReport()
+    try:
+        rows = zone_cache.load(zone_path)
+    except OSError as err:
+        report.problems.append(Problem('error', zone_path, None, str(err)))
+        return report
+
+    conditions: List[int] = []
+    defined: Dict[str, str] = {}
+    variables = project.variables.get(project.target, {})
+
+    # Só o índice de assets (na memória) é consultado aqui, nenhuma zona é escrita e o Linker não roda
+    for line_number, row in enumerate(rows, 1):
+        if '${' in row[1] and row[0] != Comment.code:
+            try:
+                row = parse_line(substitute(row[1], lambda name: defined.get(name, variables.get(name))))
+            except ValueError as err:
+                # Dentro de um #ifdef a variável pode não existir de propósito
+                if len(conditions) == 0:
+                    report.problems.append(Problem('error', zone_path, line_number, str(err)))
+
+                continue
+
+        code = row[0]
+        if code == Directive.code:
+            check_directive(report, zone_path, line_number, row, conditions, defined)
+        elif code == Include.code:
+            name = row[2]
+            search_path = project.asset_index.find(f'zone_source/{name}.zone')
+            if search_path is None:
+                report.problems.append(Problem('error', zone_path, line_number, _('include,%s: zone_source/%s.zone not found') % (name, name)))
+            else:
+                report.includes.append((os.path.abspath(os.path.join(search_path, 'zone_source', f'{name}.zone')), line_number))
+        elif code == Script.code:
+            if project.asset_index.find(row[2]) is None:
+                report.problems.append(Problem('warning', zone_path, line_number, _('script,%s: not found in the project, it must come from a loaded fastfile') % row[2]))
+        elif code == FileStatement.code:
+            if not _exists(project, row[4]):
+                report.problems.append(Problem('error', zone_path, line_number, _('%s: %s matches no files') % (row[2] if row[3] is None else f'{row[2]}_{row[3]}', row[4])))
+        elif code == Asset.code:
+            asset_type, _separator, name = row[1].partition(',')
+            asset_type, name = asset_type.strip(), name.split('//')[0].strip()
+            if asset_type not in ASSET_TYPES:
+                report.problems.append(Problem('warning', zone_path, line_number, _('%s: unknown asset type') % row[1].strip()))
+            elif asset_type in ASSET_FILES and not _exists(project, ASSET_FILES[asset_type].format(name=name)):
+                report.problems.append(Problem('warning', zone_path, line_number, _('%s,%s: not found in the project, it must come from a loaded fastfile') % (asset_type, name)))
+        elif code == Line.code and row[1].strip() != '':
+            report.problems.append(Problem('warning', zone_path, line_number, _('unrecognized line: %s') % row[1].strip()))
+
+    if len(conditions) > 0:
+        report.problems.append(Problem('error', zone_path, conditions[-1], _('#if without #endif')))
+
+    return report
+
+def find_include_cycles(edges: Dict[str, List[Tuple[str, int]]], roots: List[str]) -> List[Problem]:
+    problems: List[Problem] = []
+    done: Set[str] = set()
+
+    def visit(zone_path: str, chain: List[str]) -> None:
+        for included, line_number in edges.get(zone_path, []):
+            key = os.path.normcase(included)
+            if key in map(os.path.normcase, chain):
+                problems.append(Problem('error', zone_path, line_number, _('include cycle: %s') % ' -> '.join(chain + [included])))
+            elif key not in done:
+                visit(included, chain + [included])
+
+        done.add(os.path.normcase(zone_path))
+
+    for root in roots:
+        visit(root, [root])
+
+    return problems
+
+def check_project(project: Project, jobs: int, defines: List[str] | None = None) -> Tuple[List[Problem], int]:
+    problems: List[Problem] = []
+
+    project.defines = parse_defines(defines)
+    project.variables = {project.target: zone_variables(project, project.target)}
+
+    asset_index_path = os.path.join(cache_folder(project), 'asset-index.json')
+    project.asset_index.load(asset_index_path)
+    project.asset_index.refresh(jobs)
+    project.asset_index.save(asset_index_path)
+
+    game_home = os.environ.get('GAME_HOME')
+    for fastfile in project.fastfiles:
+        if '$GAME_HOME' in fastfile and game_home is None:
+            continue
+
+        fastfile_path = fastfile.replace('$GAME_HOME', game_home or '').replace('$HOME', project.home)
+        if not os.path.isfile(fastfile_path):
+            problems.append(Problem('error', os.path.join(project.home, 'project.t6modm.json'), None, _('fastfile not found: %s') % fastfile_path))
+
+    # mod.zone do projeto e de cada dependência, e depois as zonas incluídas, nível por nível
+    roots = [os.path.join(project.home, 'src', 'zone_source', 'mod.zone')]
+    roots.extend(dependency.zone_path for dependency in project.dependency_graph.order if os.path.isfile(dependency.zone_path))
+
+    zone_cache = ZoneCache(os.path.join(cache_folder(project), 'zones'))
+    edges: Dict[str, List[Tuple[str, int]]] = {}
+    seen = {os.path.normcase(root) for root in roots}
+    level = roots
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while len(level) > 0:
+            next_level: List[str] = []
+            for zone_path, report in zip(level, executor.map(lambda zone_path: check_zone(project, zone_cache, zone_path), level)):
+                problems.extend(report.problems)
+                edges[zone_path] = report.includes
+                for included, _line_number in report.includes:
+                    if os.path.normcase(included) not in seen:
+                        seen.add(os.path.normcase(included))
+                        next_level.append(included)
+
+            level = next_level
+
+    problems.extend(find_include_cycles(edges, roots))
+    return problems, len(edges)
+
+def check_command(project: Project, args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    problems, zones = check_project(project, args.jobs, args.define)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    problems.sort(key=lambda problem: (problem.path, problem.line_number or 0))
+    for problem in problems:
+        label = f'{Colors.RED}ERR!{Colors.RESET}' if problem.severity == 'error' else f'{Colors.YELLOW}WARN{Colors.RESET}'
+        print(f'[{label}] {problem.location}: {problem.message}')
+
+    errors = sum(1 for problem in problems if problem.severity == 'error')
+    warnings = len(problems) - errors
+    if len(problems) == 0:
+        message = _('No problems found in %(zones)s zones (%(elapsed).0f ms).')
+        print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % {'zones': zones, 'elapsed': elapsed}}')
+        return
+
+    message = _('%(errors)s errors and %(warnings)s warnings found in %(zones)s zones (%(elapsed).0f ms).')
+    print(f'[{Colors.RED if errors > 0 else Colors.YELLOW}{'ERR!' if errors > 0 else 'WARN'}{Colors.RESET}] {message % {'errors': errors, 'warnings': warnings, 'zones': zones, 'elapsed': elapsed}}')
+
+    if errors > 0 or args.strict:
+        sys.exit(1)
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import argparse
+import threading
+from typing import Any, Dict
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from shared_cache import default_folder
+from argument_parser import __version__
+
+SOURCE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+def daemon_address() -> str:
+    if os.name == 'nt':
+        return rf'\\.\pipe\t6modm-{os.environ.get("USERNAME", "user")}'
+
+    return os.path.join(default_folder(), 'daemon.sock')
+
+def key_path() -> str:
+    return os.path.join(default_folder(), 'daemon.key')
+
+def tool_fingerprint() -> str:
+    # Um daemon iniciado antes de um "t6modm update" não pode compilar com o código antigo
+    mtime = 0
+    for root, _dirs, files in os.walk(SOURCE_FOLDER):
+        for name in files:
+            if name.endswith('.py'):
+                mtime = max(mtime, os.stat(os.path.join(root, name)).st_mtime_ns)
+
+    return json.dumps([__version__, mtime])
+
+def connect() -> Connection | None:
+    try:
+        with open(key_path(), 'r') as file:
+            authkey = bytes.fromhex(file.read().strip())
+
+        return Client(daemon_address(), authkey=authkey)
+    except (OSError, ValueError, EOFError, AuthenticationError):
+        return None # Nenhum daemon rodando (ou um que morreu sem apagar a chave)
+
+def forward_build(args: argparse.Namespace) -> int | None:
+    # Envia o build para o daemon, se houver um. None quer dizer que o build deve rodar neste processo.
+    connection = connect()
+    if connection is None:
+        return None
+
+    with connection:
+        try:
+            connection.send({'action': 'build', 'args': args, 'cwd': os.getcwd(), 'environ': dict(os.environ), 'fingerprint': tool_fingerprint()})
+            while True:
+                message = connection.recv()
+                if message[0] == 'stdout':
+                    sys.stdout.write(message[1])
+                    sys.stdout.flush()
+                elif message[0] == 'stderr':
+                    sys.stderr.write(message[1])
+                    sys.stderr.flush()
+                elif message[0] == 'exit':
+                    return message[1]
+                else:
+                    return None # Daemon desatualizado, ele mesmo termina
+        except (OSError, EOFError):
+            return None # O daemon morreu no meio do caminho, compila aqui
+
+class ClientDisconnected(Exception):
+    pass
+
+def watch_client(connection: Connection, done: threading.Event) -> None:
+    # O cliente não manda mais nada depois do pedido, então qualquer evento na conexão é ele indo embora (Ctrl+C)
+    while not done.is_set():
+        try:
+            if not connection.poll(0.2):
+                continue
+        except (OSError, EOFError):
+            pass
+
+        if not done.is_set():
+            from linker import terminate_linkers
+            terminate_linkers()
+
+        return
+
+class ConnectionWriter:
+    # Substitui o stdout/stderr durante um build, cada print vai para o terminal do cliente
+    def __init__(self, connection: Connection, stream: str, lock: threading.Lock):
+        self.connection = connection
+        self.stream = stream
+        self.lock = lock
+
+    def write(self, text: str) -> int:
+        if len(text) > 0:
+            try:
+                with self.lock:
+                    self.connection.send((self.stream, text))
+            except OSError:
+                raise ClientDisconnected() # Ctrl+C no cliente, o build (e o Linker) para aqui também
+
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+class Daemon:
+    def __init__(self):
+        self.fingerprint = tool_fingerprint()
+        self.asset_indexes: Dict[str, Any] = {} # Pasta do projeto -> AssetIndex já carregado
+        self.zone_caches: Dict[str, Any] = {} # Pasta do projeto -> ZoneCache com as zonas na memória
+
+    def build(self, args: argparse.Namespace) -> int:
+        from build import build_project, load_project
+        from build_cache import cache_folder
+        from profiler import profiler
+        from shared_cache import shared_cache
+        from zone_ir import ZoneCache
+
+        project = load_project(args.project_dir)
+
+        asset_index = self.asset_indexes.get(project.home)
+        if asset_index is not None and asset_index.search_paths == project.asset_search_path:
+            project.asset_index = asset_index
+
+        self.asset_indexes[project.home] = project.asset_index
+        project.zone_cache = self.zone_caches.setdefault(project.home, ZoneCache(os.path.join(cache_folder(project), 'zones'), keep_in_memory=True))
+
+        shared_cache.enable()
+        if args.profile is not None:
+            profiler.enable()
+
+        try:
+            build_project(project, args)
+        finally:
+            shared_cache.flush()
+            if args.profile is not None:
+                profiler.write(args.profile)
+                profiler.disable()
+
+        return 0
+
+    def handle(self, connection: Connection, request: Dict[str, Any]) -> None:
+        import traceback
+        from contextlib import redirect_stderr, redirect_stdout
+
+        # Cada build roda com o diretório e as variáveis de ambiente do cliente (OAT_HOME, GAME_HOME...)
+        cwd = os.getcwd()
+        environ = dict(os.environ)
+        lock = threading.Lock()
+        done = threading.Event()
+        threading.Thread(target=watch_client, args=(connection, done), daemon=True).start()
+        code = 0
+        try:
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['environ'])
+
+            with redirect_stdout(ConnectionWriter(connection, 'stdout', lock)), redirect_stderr(ConnectionWriter(connection, 'stderr', lock)):
+                try:
+                    code = self.build(request['args'])
+                except SystemExit as err:
+                    code = err.code if isinstance(err.code, int) else 0 if err.code is None else 1
+                except ClientDisconnected:
+                    return
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+        except ClientDisconnected:
+            return
+        finally:
+            done.set()
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+
+        try:
+            connection.send(('exit', code))
+        except OSError:
+            pass
+
+def start_daemon() -> None:
+    import secrets
+    from i18n import _
+    from colors import Colors
+
+    connection = connect()
+    if connection is not None:
+        connection.close()
+        message = _('A daemon is already running.')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message}')
+        sys.exit(1)
+
+    address = daemon_address()
+    os.makedirs(default_folder(), exist_ok=True)
+    if os.name != 'nt' and os.path.exists(address):
+        os.unlink(address) # Socket de um daemon que não terminou direito
+
+    # Só quem consegue ler a chave (o próprio usuário) pode mandar builds para o daemon
+    authkey = secrets.token_bytes(32)
+    listener = Listener(address, authkey=authkey)
+    descriptor = os.open(key_path(), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w') as file:
+        file.write(authkey.hex())
+
+    daemon = Daemon()
+    message = _('Daemon listening on %s, press Ctrl+C to stop...')
+    print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % address}')
+
+    try:
+        while True:
+            try:
+                connection = listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue # Cliente sem a chave certa ou que desistiu da conexão
+
+            with connection:
+                try:
+                    request = connection.recv()
+                except (OSError, EOFError):
+                    continue
+
+                if request.get('action') == 'stop':
+                    connection.send(('exit', 0))
+                    break
+
+                if request.get('fingerprint') != daemon.fingerprint:
+                    connection.send(('stale',))
+                    message = _('The tool was updated, stopping the daemon.')
+                    print(f'[{Colors.YELLOW}WARN{Colors.RESET}] {message}')
+                    break
+
+                daemon.handle(connection, request)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        try:
+            os.unlink(key_path())
+        except OSError:
+            pass
+
+def stop_daemon() -> None:
+    from i18n import _
+    from colors import Colors
+
+    connection = connect()
+    if connection is None:
+        message = _('No daemon is running.')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message}')
+        sys.exit(1)
+
+    with connection:
+        connection.send({'action': 'stop'})
+        try:
+            connection.recv()
+        except (OSError, EOFError):
+            pass
+
+    message = _('The daemon has been stopped.')
+    print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message}')
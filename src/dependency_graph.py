@@ -0,0 +1,116 @@
+import os
+import json
+import heapq
+from typing import Dict, List
+from exceptions import DependencyCycleException, DependencyNotFoundException
+
+PROJECT_FILE = 'project.t6modm.json'
+
+def dependency_key(home: str) -> str:
+    # Caminhos diferentes (links, $HOME, caminhos relativos) para a mesma pasta são a mesma dependência
+    return os.path.normcase(os.path.realpath(home))
+
+def resolve_dependency(spec: str, home: str) -> str:
+    # $HOME é a pasta do projeto que declarou a dependência, caminhos relativos também partem dela
+    home = os.path.abspath(home)
+    path = spec.replace('$HOME', home)
+    if not os.path.isabs(path):
+        path = os.path.join(home, path)
+
+    return os.path.normpath(path)
+
+def read_dependencies(home: str) -> List[str]:
+    try:
+        with open(os.path.join(home, PROJECT_FILE), 'r') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return [] # Uma dependência sem project.t6modm.json só contribui com o src dela
+
+    return data.get('dependencies', [])
+
+class Dependency:
+    __slots__ = ('spec', 'home', 'name', 'index', 'dependencies')
+
+    def __init__(self, spec: str, home: str, index: int):
+        self.spec = spec # Como aparece no project.t6modm.json de quem a declarou primeiro
+        self.home = home
+        self.name = os.path.basename(os.path.normpath(spec))
+        self.index = index # Ordem em que foi encontrada (pré-ordem)
+        self.dependencies: List[Dependency] = []
+
+    @property
+    def source_folder(self) -> str:
+        return os.path.join(self.home, 'src')
+
+    @property
+    def zone_path(self) -> str:
+        return os.path.join(self.home, 'src', 'zone_source', 'mod.zone')
+
+    @property
+    def project_file(self) -> str:
+        return os.path.join(self.home, PROJECT_FILE)
+
+    def __repr__(self) -> str:
+        return f'Dependency({self.spec!r}, {self.home!r})'
+
+class DependencyGraph:
+    def __init__(self, home: str, dependencies: List[str]):
+        self.home = home
+        self.nodes: Dict[str, Dependency] = {}
+        self.order: List[Dependency] = [] # Pós-ordem: cada dependência vem depois das dependências dela
+        self.dependencies = self._load(home, dependencies, [home], [dependency_key(home)])
+        self.search_order = self._search_order()
+
+    def _load(self, home: str, specs: List[str], chain: List[str], chain_keys: List[str]) -> List[Dependency]:
+        children: List[Dependency] = []
+        for spec in specs:
+            dependency_home = resolve_dependency(spec, home)
+            key = dependency_key(dependency_home)
+            if key in chain_keys:
+                raise DependencyCycleException(chain + [dependency_home])
+
+            # Uma dependência que não existe não pode sumir do build sem nenhum aviso
+            if not os.path.isdir(dependency_home):
+                raise DependencyNotFoundException(spec, dependency_home, os.path.join(home, PROJECT_FILE))
+
+            # Uma dependência compartilhada por outras é carregada (e depois analisada) uma única vez
+            dependency = self.nodes.get(key)
+            if dependency is None:
+                dependency = Dependency(spec, dependency_home, len(self.nodes))
+                self.nodes[key] = dependency
+                dependency.dependencies = self._load(dependency_home, read_dependencies(dependency_home), chain + [dependency_home], chain_keys + [key])
+                self.order.append(dependency)
+
+            if dependency not in children:
+                children.append(dependency)
+
+        return children
+
+    def _search_order(self) -> List[Dependency]:
+        # Quem depende vem antes das suas dependências (os assets dele têm prioridade), e entre as
+        # que estão livres vale a ordem em que foram declaradas
+        dependents = {dependency.index: 0 for dependency in self.order}
+        for dependency in self.order:
+            for child in dependency.dependencies:
+                dependents[child.index] += 1
+
+        by_index = {dependency.index: dependency for dependency in self.order}
+        ready = [dependency.index for dependency in self.dependencies if dependents[dependency.index] == 0]
+        heapq.heapify(ready)
+
+        order: List[Dependency] = []
+        while len(ready) > 0:
+            dependency = by_index[heapq.heappop(ready)]
+            order.append(dependency)
+            for child in dependency.dependencies:
+                dependents[child.index] -= 1
+                if dependents[child.index] == 0:
+                    heapq.heappush(ready, child.index)
+
+        return order
+
+    def project_files(self) -> List[str]:
+        return [dependency.project_file for dependency in self.order]
+
+    def __len__(self) -> int:
+        return len(self.order)
@@ -7,4 +7,33 @@ class ZoneNotFoundException(Exception):
     def __init__(self, source: str, file_path: str):
         Exception.__init__(self, f'"{file_path}" isn\'t a valid file, at {source}')
         self.source = source
-        self.file_path = file_path
\ No newline at end of file
+        self.file_path = file_path
+
+class IncludeCycleException(Exception):
+    def __init__(self, chain: list[str]):
+        Exception.__init__(self, f'include cycle: {' -> '.join(chain)}')
+        self.chain = chain
+
+class ZonePreprocessorException(Exception):
+    def __init__(self, source: str, line_number: int, message: str):
+        Exception.__init__(self, f'{source}:{line_number}: {message}')
+        self.source = source
+        self.line_number = line_number
+        self.message = message
+
+class DependencyCycleException(Exception):
+    def __init__(self, chain: list[str]):
+        Exception.__init__(self, f'dependency cycle: {' -> '.join(chain)}')
+        self.chain = chain
+
+class DependencyNotFoundException(Exception):
+    def __init__(self, spec: str, home: str, declared_by: str):
+        Exception.__init__(self, f'dependency not found: {spec} ({home}), declared by {declared_by}')
+        self.spec = spec
+        self.home = home
+        self.declared_by = declared_by
+
+class LinkerTimeoutException(Exception):
+    def __init__(self, timeout: float):
+        Exception.__init__(self, f'the Linker did not finish in {timeout} seconds')
+        self.timeout = timeout
\ No newline at end of file
@@ -0,0 +1,193 @@
+import os
+import json
+import shutil
+import fnmatch
+import hashlib
+from typing import Dict, List, Set, Tuple
+from project import Project
+from build_cache import Fingerprint
+from dependency_graph import Dependency
+from staging import replace_if_changed
+from zone_ir import ASSET_FILES, Asset, Script, parse_line
+
+MANIFEST = 'fastfiles.json'
+
+class Fastfile:
+    __slots__ = ('name', 'zone_path', 'includes')
+
+    def __init__(self, name: str, zone_path: str, includes: List[str]):
+        self.name = name # Nome do .ff gerado pelo Linker (o nome da zona)
+        self.zone_path = zone_path
+        self.includes = includes # Linhas da zona, além do cabeçalho
+
+    def __repr__(self) -> str:
+        return f'Fastfile({self.name!r}, {self.zone_path!r})'
+
+def fastfile_names(project: Project) -> Dict[str, str]:
+    # Dependência -> nome do fastfile dela, sem repetir nomes (duas dependências "scripts" em pastas diferentes)
+    names: Dict[str, str] = {}
+    used = {'mod', *project.zone_groups}
+    for dependency in project.dependency_graph.order:
+        name = ''.join(char if char.isalnum() or char in '_-' else '_' for char in dependency.name) or 'dependency'
+        candidate, index = name, 1
+        while candidate in used:
+            index += 1
+            candidate = f'{name}_{index}'
+
+        used.add(candidate)
+        names[dependency.home] = candidate
+
+    return names
+
+def write_fastfile_zone(fastfile: Fastfile) -> None:
+    partial_path = f'{fastfile.zone_path}.partial'
+    with open(partial_path, 'w') as zone_file:
+        zone_file.write('>game,T6\n')
+        zone_file.write(f'>name,{fastfile.name}\n')
+        for line in fastfile.includes:
+            zone_file.write(f'{line}\n')
+
+    replace_if_changed(partial_path, fastfile.zone_path)
+
+def split_fastfiles(project: Project, dependencies: List[Tuple[Dependency, str]], target: str) -> List[Fastfile]:
+    # As dependências primeiro, na ordem do grafo, depois os grupos na ordem do project.t6modm.json e o mod.ff por último
+    zone_source = os.path.join(project.home, 'src', 'zone_source')
+    names = fastfile_names(project)
+    fastfiles: List[Fastfile] = []
+    for dependency, temp_name in dependencies:
+        name = names[dependency.home]
+        include_path = os.path.relpath(project.temp_zone_path(temp_name, target), zone_source).replace(os.sep, '/')
+        fastfiles.append(Fastfile(name, f'{project.temp_zone_path(name, target)}.zone', [f'// Dependency: {dependency.name}', f'include,{include_path}']))
+
+    for group in project.zone_groups:
+        includes = project.group_includes.get(group, {}).get(target, [])
+        if len(includes) > 0:
+            fastfiles.append(Fastfile(group, f'{project.temp_zone_path(group, target)}.zone', includes))
+
+    for fastfile in fastfiles:
+        write_fastfile_zone(fastfile)
+
+    fastfiles.append(Fastfile('mod', f'{project.temp_zone_path('mod', target)}.zone', []))
+    return fastfiles
+
+def zone_text(zone_path: str, zone_source: str, seen: Set[str] | None = None) -> List[str]:
+    # A zona e as zonas temporárias incluídas por ela, é isso que o Linker lê
+    seen = seen if seen is not None else set()
+    key = os.path.normcase(os.path.abspath(zone_path))
+    if key in seen:
+        return []
+
+    seen.add(key)
+    try:
+        with open(zone_path, 'r') as zone_file:
+            lines = zone_file.read().split('\n')
+    except OSError:
+        return []
+
+    text = list(lines)
+    for line in lines:
+        if line.startswith('include,'):
+            name = line[len('include,'):].split('//')[0].strip()
+            text.extend(zone_text(f'{os.path.join(zone_source, name)}.zone', zone_source, seen))
+
+    return text
+
+def referenced_paths(text: List[str]) -> Set[str]:
+    # Caminhos citados pela zona (script,scripts/x.gsc / rawfile,maps/x.cfg / localize,mod), só esses arquivos ficam presos a um fastfile.
+    # O localize vira um padrão (*/localizedstrings/mod.str), um arquivo por idioma.
+    paths: Set[str] = set()
+    for line in text:
+        row = parse_line(line)
+        if row[0] == Script.code:
+            paths.add(os.path.normcase(row[2].replace('\\', '/')))
+        elif row[0] == Asset.code:
+            asset_type, _separator, name = row[1].partition(',')
+            name = name.split('//')[0].strip().replace('\\', '/')
+            paths.add(os.path.normcase(ASSET_FILES.get(asset_type.strip(), '{name}').format(name=name)))
+
+    return paths
+
+def matching_references(rel: str, referenced: Set[str], patterns: List[str]) -> List[str]:
+    # Referências (caminhos ou padrões de referenced_paths) que apontam para o arquivo rel
+    if rel in referenced:
+        return [rel]
+
+    return [pattern for pattern in patterns if fnmatch.fnmatchcase(rel, pattern)]
+
+def fastfile_keys(project: Project, fastfiles: List[Fastfile], commands: Dict[str, List[str]], inputs: Dict[str, Fingerprint]) -> Dict[str, str]:
+    # Um fastfile só é linkado de novo quando a zona dele, o comando ou algum arquivo que ele pode usar mudou.
+    # Arquivos que vão apenas para o IWD/zip não contam. Arquivos citados por caminho contam só para as zonas que os citam,
+    # o resto (modelos, materiais, o próprio Linker, os fastfiles carregados) conta para todos.
+    zone_source = os.path.join(project.home, 'src', 'zone_source')
+    texts = {fastfile.name: zone_text(fastfile.zone_path, zone_source) for fastfile in fastfiles}
+    references = {name: referenced_paths(text) for name, text in texts.items()}
+    referenced = set().union(*references.values())
+    patterns = [reference for reference in referenced if '*' in reference]
+    archived = {os.path.abspath(file.source) for file in [*project.files, *project.serverfiles, *project.filtered_scripts]}
+
+    shared: List[Tuple[str, str]] = []
+    owned: Dict[str, List[Tuple[str, str]]] = {}
+    for path, fingerprint in sorted(inputs.items()):
+        search_path = next((search_path for search_path in project.asset_search_path if path.startswith(os.path.join(search_path, ''))), None)
+        if search_path is None:
+            shared.append((path, fingerprint[2]))
+            continue
+
+        rel = os.path.normcase(os.path.relpath(path, search_path).replace(os.sep, '/'))
+        if rel.startswith('zone_source/'):
+            continue # As zonas já entram pelo texto gerado
+
+        matched = matching_references(rel, referenced, patterns)
+        for reference in matched:
+            owned.setdefault(reference, []).append((path, fingerprint[2]))
+
+        if len(matched) == 0 and os.path.abspath(path) not in archived:
+            shared.append((path, fingerprint[2]))
+
+    shared_digest = hashlib.sha1(json.dumps(shared).encode('utf-8')).hexdigest()
+    keys: Dict[str, str] = {}
+    for fastfile in fastfiles:
+        files = [entry for rel in sorted(references[fastfile.name]) for entry in owned.get(rel, [])]
+        keys[fastfile.name] = hashlib.sha1(json.dumps([texts[fastfile.name], commands[fastfile.name], shared_digest, files]).encode('utf-8')).hexdigest()
+
+    return keys
+
+class FastfileState:
+    # Chave de cada fastfile no último build que deu certo, um fastfile com a mesma chave é copiado da saída anterior
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.keys: Dict[str, str] = {}
+
+        try:
+            with open(file_path, 'r') as file:
+                self.keys = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+    def reuse(self, name: str, key: str, output_folder: str, staged_folder: str) -> bool:
+        previous_path = os.path.join(output_folder, f'{name}.ff')
+        if self.keys.get(name) != key or not os.path.isfile(previous_path):
+            return False
+
+        # Um hard link não copia nada, e a troca no fim do build vê que o arquivo é o mesmo
+        staged_path = os.path.join(staged_folder, f'{name}.ff')
+        try:
+            os.link(previous_path, staged_path)
+        except OSError:
+            shutil.copy2(previous_path, staged_path)
+
+        return True
+
+    def save(self, keys: Dict[str, str]) -> None:
+        self.keys = keys
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with open(self.file_path, 'w') as file:
+            json.dump(keys, file)
+
+def write_manifest(folder: str, fastfiles: List[Fastfile]) -> None:
+    # Ordem de carregamento: as dependências primeiro, o mod.ff por último
+    partial_path = os.path.join(folder, f'{MANIFEST}.partial')
+    with open(partial_path, 'w') as manifest_file:
+        json.dump({'fastfiles': [fastfile.name for fastfile in fastfiles]}, manifest_file, indent=4)
+
+    os.replace(partial_path, os.path.join(folder, MANIFEST))
@@ -1,6 +1,68 @@
-from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+Operation = Tuple[str | None, ...]
 
-@dataclass
 class File:
-    source: str
-    dest: str
\ No newline at end of file
+    __slots__ = ('source', 'dest')
+
+    def __init__(self, source: str, dest: str):
+        self.source = source
+        self.dest = dest
+
+    def __repr__(self) -> str:
+        return f'File(source={self.source!r}, dest={self.dest!r})'
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, File):
+            return NotImplemented
+
+        return self.source == other.source and self.dest == other.dest
+
+class FileRegistry:
+    def __init__(self, source_folder: str):
+        self.source_folder = source_folder # Arquivos vindos daqui (o src do próprio projeto) não podem ser sobrescritos
+        self._files: Dict[str, File] = {}
+
+    def add(self, source: str, dest: str, target: str | None = None) -> bool:
+        # O alvo só importa para o FileJournal, um registro guarda os arquivos de um único alvo
+        file = self._files.get(dest)
+        if file is not None:
+            if file.source.startswith(self.source_folder):
+                return False
+
+            # O arquivo sobrescrito vai para o final, assim como antes (remove + append)
+            del self._files[dest]
+
+        self._files[dest] = File(source, dest)
+        return True
+
+    def get(self, dest: str) -> File | None:
+        return self._files.get(dest)
+
+    def __contains__(self, dest: str) -> bool:
+        return dest in self._files
+
+    def __iter__(self) -> Iterator[File]:
+        return iter(self._files.values())
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+class FileList(List[File]):
+    # Lista dos scripts filtrados, aceita o alvo assim como o FileJournal
+    def append(self, file: File, target: str | None = None) -> None:
+        super().append(file)
+
+class FileJournal:
+    # Guarda as operações feitas numa cópia do projeto (análise em paralelo) para aplicá-las depois, na ordem certa
+    def __init__(self, journal: List[Operation], kind: str):
+        self.journal = journal
+        self.kind = kind
+
+    # Numa análise feita para vários alvos, cada operação guarda o alvo ao qual pertence (None vale para todos)
+    def add(self, source: str, dest: str, target: str | None = None) -> bool:
+        self.journal.append((self.kind, source, dest, target))
+        return True
+
+    def append(self, file: File, target: str | None = None) -> None:
+        self.journal.append((self.kind, file.source, file.dest, target))
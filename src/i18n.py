@@ -1,25 +1,40 @@
 import os
-import locale
-import gettext
-import warnings
 
 DOMAIN = "t6modm"
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOCALES_DIR = os.path.join(BASE_DIR, "locales")
 
-locale.setlocale(locale.LC_ALL, '')
-lang_info = locale.getdefaultlocale()
-lang = lang_info[0] if lang_info else None
-if lang is None:
-    warnings.warn('Locale not detected, falling back to "en_US".')
-    lang = 'en_US'
-
-translation = gettext.translation(
-    DOMAIN,
-    localedir=LOCALES_DIR,
-    languages=[lang],
-    fallback=True
-)
-
-_ = translation.gettext
\ No newline at end of file
+translate = None
+
+def load_translation() -> 'gettext.NullTranslations':
+    # O locale e o catálogo só são carregados na primeira mensagem traduzida, o --version e o parse dos argumentos não pagam por isso
+    import locale
+    import gettext
+    import warnings
+
+    locale.setlocale(locale.LC_ALL, '')
+    lang_info = locale.getdefaultlocale()
+    lang = lang_info[0] if lang_info else None
+    if lang is None:
+        warnings.warn('Locale not detected, falling back to "en_US".')
+        lang = 'en_US'
+
+    return gettext.translation(
+        DOMAIN,
+        localedir=LOCALES_DIR,
+        languages=[lang],
+        fallback=True
+    )
+
+def _(message: str) -> str:
+    global translate
+
+    if translate is None:
+        translate = load_translation().gettext
+
+    return translate(message)
+
+def N_(message: str) -> str:
+    # Só marca a mensagem para a extração, ela é traduzida quando for exibida
+    return message
@@ -0,0 +1,113 @@
+import re
+import time
+import asyncio
+import threading
+from typing import Callable, List, Set
+from profiler import profiler
+from exceptions import LinkerTimeoutException
+
+STREAM_LIMIT = 1024 * 1024 # Linhas muito longas (caminhos de assets) não podem estourar o buffer do asyncio
+STOP_TIMEOUT = 5
+
+# Linkers rodando agora, o daemon para todos quando o cliente desiste do build
+running: Set[asyncio.subprocess.Process] = set()
+running_lock = threading.Lock()
+
+# A ordem importa, a primeira expressão que casar define o tipo da linha
+LINE_PATTERNS = [
+    ('error', re.compile(r'^\s*\[?(?:error|fatal)\b|\b(?:failed|could not|cannot|unable to)\b', re.IGNORECASE)),
+    ('warning', re.compile(r'^\s*\[?warn(?:ing)?\b', re.IGNORECASE)),
+    ('progress', re.compile(r'^\s*(?:loading|loaded|unloading|building|built|linking|writing|wrote|saving|saved|creating|created)\b', re.IGNORECASE))
+]
+
+class LinkerEvent:
+    __slots__ = ('kind', 'stream', 'line', 'time')
+
+    def __init__(self, kind: str, stream: str, line: str):
+        self.kind = kind # error, warning, progress ou output
+        self.stream = stream # stdout ou stderr
+        self.line = line
+        self.time = time.perf_counter()
+
+    def __repr__(self) -> str:
+        return f'LinkerEvent({self.kind!r}, {self.stream!r}, {self.line!r})'
+
+def parse_line(stream: str, line: str) -> LinkerEvent:
+    for kind, pattern in LINE_PATTERNS:
+        if pattern.search(line):
+            return LinkerEvent(kind, stream, line)
+
+    return LinkerEvent('output', stream, line)
+
+async def _read_lines(reader: asyncio.StreamReader, stream: str, on_event: Callable[[LinkerEvent], None]) -> None:
+    while True:
+        line = await reader.readline()
+        if len(line) == 0:
+            return
+
+        event = parse_line(stream, line.decode(errors='replace').rstrip('\r\n'))
+        if profiler.enabled:
+            profiler.count(f'linker.{event.kind}')
+            if event.kind != 'output':
+                profiler.instant(event.kind, category='linker', line=event.line)
+
+        on_event(event)
+
+async def _stop(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is not None:
+        return
+
+    # Primeiro pede para o Linker terminar, só mata o processo se ele não obedecer
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), STOP_TIMEOUT)
+    except ProcessLookupError:
+        pass
+    except TimeoutError:
+        process.kill()
+        await process.wait()
+
+async def _run(command: List[str], timeout: float | None, on_event: Callable[[LinkerEvent], None]) -> int:
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=STREAM_LIMIT
+    )
+
+    assert process.stdout is not None and process.stderr is not None
+    with running_lock:
+        running.add(process)
+
+    try:
+        async with asyncio.timeout(timeout):
+            await asyncio.gather(
+                _read_lines(process.stdout, 'stdout', on_event),
+                _read_lines(process.stderr, 'stderr', on_event)
+            )
+            return await process.wait()
+    except TimeoutError:
+        await _stop(process)
+        raise LinkerTimeoutException(timeout or 0)
+    except BaseException:
+        # Ctrl+C (o asyncio.run cancela a tarefa) ou erro ao tratar uma linha, o Linker não pode ficar órfão
+        await _stop(process)
+        raise
+    finally:
+        with running_lock:
+            running.discard(process)
+
+def terminate_linkers() -> None:
+    # Pode ser chamado de outra thread, o _run de cada Linker percebe o fim da saída e termina normalmente
+    with running_lock:
+        processes = list(running)
+
+    for process in processes:
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            pass
+
+def run_linker(command: List[str], timeout: float | None, on_event: Callable[[LinkerEvent], None]) -> int:
+    # Executa o Linker sem shell, lendo a saída linha a linha
+    return asyncio.run(_run(command, timeout, on_event))
@@ -0,0 +1,128 @@
+import os
+import re
+import string
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from file import File
+from profiler import profiler
+from shared_cache import shared_cache
+
+MINIFY_VERSION = 1
+SCRIPT_EXTENSIONS = ('.gsc', '.csc')
+PARALLEL_MIN = 16 # Com poucos scripts, iniciar os processos custa mais do que minificar tudo aqui
+
+WORD = frozenset(string.ascii_letters + string.digits + '_')
+OPERATORS = frozenset('+-*/%&|^<>=!~.#?:')
+
+class Patterns:
+    # Strings e diretivas (#include, #using_animtree, #define) ficam intactas. Quebras de linha são mantidas para
+    # os erros do servidor continuarem apontando para a linha certa do arquivo original.
+    TOKEN = re.compile(
+        r'(?P<string>"(?:[^"\\\n]|\\.)*")'
+        r'|(?P<directive>^[ \t]*#[A-Za-z_][^\n]*(?:(?<=\\)\n[^\n]*)*)'
+        r'|(?P<newline>\n)'
+        r'|(?P<gap>(?:[ \t\f\v\r]|//[^\n]*|/\*.*?\*/)+)',
+        re.MULTILINE | re.DOTALL
+    )
+
+def _replace(match: re.Match[str]) -> str:
+    group = match.lastgroup
+    if group != 'gap':
+        return match.group()
+
+    # Espaços e comentários: só sobra o necessário para separar dois tokens (a b, a - -b, a / *b)
+    newlines = match.group().count('\n') # Comentários /* */ de várias linhas
+    if newlines > 0:
+        return '\n' * newlines
+
+    source = match.string
+    start, end = match.span()
+    if start == 0 or end == len(source):
+        return ''
+
+    before, after = source[start - 1], source[end]
+    if (before in WORD and after in WORD) or (before in OPERATORS and after in OPERATORS):
+        return ' '
+
+    return ''
+
+def minify(source: str) -> str:
+    return Patterns.TOKEN.sub(_replace, source)
+
+def minify_file(source_path: str, minified_path: str) -> int:
+    # Executado nos processos do pool. latin-1 mantém qualquer byte (strings em UTF-8) como está.
+    with open(source_path, 'r', encoding='latin-1', newline='') as source_file:
+        minified = minify(source_file.read())
+
+    partial_path = f'{minified_path}.{os.getpid()}.partial'
+    with open(partial_path, 'w', encoding='latin-1', newline='') as minified_file:
+        minified_file.write(minified)
+
+    os.replace(partial_path, minified_path)
+    return len(minified)
+
+def minify_scripts(files: List[File], folder: str, jobs: int) -> List[File]:
+    # Devolve a mesma lista com os .gsc/.csc trocados pelas versões minificadas, salvas pelo hash do conteúdo original
+    os.makedirs(folder, exist_ok=True)
+
+    result: List[File] = []
+    pending: Dict[str, str] = {} # Versão minificada -> script original
+    keys: Dict[str, str] = {}
+    scripts = 0
+    for file in files:
+        extension = os.path.splitext(file.dest)[1].lower()
+        if extension not in SCRIPT_EXTENSIONS:
+            result.append(file)
+            continue
+
+        with open(file.source, 'rb') as source_file:
+            key = shared_cache.key('script', MINIFY_VERSION, hashlib.file_digest(source_file, 'sha1').hexdigest())
+
+        scripts += 1
+        minified_path = os.path.join(folder, f'{key}{extension}')
+        result.append(File(minified_path, file.dest))
+        if minified_path in pending or os.path.isfile(minified_path):
+            continue
+
+        # Outro projeto pode já ter minificado o mesmo script
+        data = shared_cache.get('script', key) if shared_cache.enabled else None
+        if data is not None:
+            with open(minified_path, 'wb') as minified_file:
+                minified_file.write(data)
+
+            continue
+
+        pending[minified_path] = file.source
+        keys[minified_path] = key
+
+    if len(pending) >= PARALLEL_MIN and jobs > 1:
+        # O minificador é Python puro, então usa processos (spawn, como no Windows) em vez de threads
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending)), mp_context=context) as executor:
+            sizes = list(executor.map(minify_file, pending.values(), pending.keys(), chunksize=max(1, len(pending) // (jobs * 4))))
+    else:
+        sizes = [minify_file(source, minified_path) for minified_path, source in pending.items()]
+
+    if profiler.enabled:
+        profiler.count('minify.scripts', scripts)
+        profiler.count('minify.minified', len(pending))
+        profiler.count('minify.bytes', sum(os.path.getsize(source) for source in pending.values()))
+        profiler.count('minify.minified_bytes', sum(sizes))
+
+    if shared_cache.enabled:
+        for minified_path, key in keys.items():
+            with open(minified_path, 'rb') as minified_file:
+                shared_cache.put('script', key, minified_file.read())
+
+    # Versões de scripts que mudaram ou saíram do projeto não servem mais
+    used = {os.path.basename(file.source) for file in result}
+    for name in os.listdir(folder):
+        if name not in used:
+            try:
+                os.unlink(os.path.join(folder, name))
+            except OSError:
+                pass
+
+    return result
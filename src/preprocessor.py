@@ -0,0 +1,157 @@
+import os
+import re
+import ast
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+from project import Project
+
+Lookup = Callable[[str], str | None]
+
+class Patterns:
+    VARIABLE = re.compile(r'\$\{(\w+)\}')
+    # && || ! viram and or not, o resto (==, !=, <, parênteses, strings) já é uma expressão Python válida
+    OPERATORS = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|&&|\|\||!(?!=)')
+
+OPERATOR_WORDS = {'&&': ' and ', '||': ' or ', '!': ' not '}
+FALSE_VALUES = ('', '0', 'false')
+
+def zone_variables(project: Project, target: str) -> Dict[str, str]:
+    # Variáveis vistas pelas zonas: as do ambiente listadas em "environment" no projeto, depois o projeto, depois o -D
+    # da linha de comando. O alvo vale sempre. O resto do ambiente fica de fora, a zona não pode depender da máquina.
+    variables = {name: os.environ[name] for name in project.environment if name in os.environ}
+    variables.update({'name': project.name, 'version': project.version, 'author': project.author, 'description': project.description})
+    variables.update(project.defines)
+    variables['target'] = target
+    return variables
+
+def parse_defines(defines: List[str] | None) -> Dict[str, str]:
+    # -D NOME=VALOR, ou só -D NOME (vale 1)
+    result: Dict[str, str] = {}
+    for define in defines or []:
+        name, separator, value = define.partition('=')
+        result[name.strip()] = value if separator else '1'
+
+    return result
+
+def substitute(text: str, lookup: Lookup) -> str:
+    def replace(match: re.Match[str]) -> str:
+        value = lookup(match[1])
+        if value is None:
+            raise ValueError(f'undefined variable: {match[1]}')
+
+        return value
+
+    return Patterns.VARIABLE.sub(replace, text)
+
+def _truthy(value: Any) -> bool:
+    if value is None:
+        return False
+
+    if isinstance(value, str):
+        return value.strip().lower() not in FALSE_VALUES
+
+    return bool(value)
+
+def _comparable(left: Any, right: Any) -> Tuple[Any, Any]:
+    # VERSION >= 2: as variáveis são sempre texto, comparadas com números viram números
+    if isinstance(left, (int, float)) != isinstance(right, (int, float)):
+        try:
+            return float(left), float(right)
+        except (TypeError, ValueError):
+            raise ValueError(f'cannot compare {left!r} with {right!r}')
+
+    return left, right
+
+COMPARISONS: Dict[type, Callable[[Any, Any], bool]] = {
+    ast.Eq: lambda left, right: left == right,
+    ast.NotEq: lambda left, right: left != right,
+    ast.Lt: lambda left, right: left < right,
+    ast.LtE: lambda left, right: left <= right,
+    ast.Gt: lambda left, right: left > right,
+    ast.GtE: lambda left, right: left >= right,
+}
+
+class Condition:
+    __slots__ = ('expression', 'tree', 'names')
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        try:
+            self.tree = ast.parse(Patterns.OPERATORS.sub(lambda match: OPERATOR_WORDS.get(match.group(), match.group()), expression).strip(), mode='eval').body
+        except SyntaxError:
+            raise ValueError(f'invalid condition: {expression}')
+
+        self.names: List[str] = []
+        self._validate(self.tree)
+
+    def _validate(self, node: ast.AST) -> None:
+        # Só comparações, and/or/not, nomes, textos, números e defined(NOME), nada de código Python
+        if isinstance(node, ast.Name):
+            if node.id not in self.names:
+                self.names.append(node.id)
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (str, int, float)):
+                raise ValueError(f'invalid condition: {self.expression}')
+        elif isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._validate(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            self._validate(node.operand)
+        elif isinstance(node, ast.Compare) and all(type(op) in COMPARISONS for op in node.ops):
+            for operand in [node.left, *node.comparators]:
+                self._validate(operand)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'defined' and len(node.args) == 1 and isinstance(node.args[0], ast.Name) and len(node.keywords) == 0:
+            self._validate(node.args[0])
+        else:
+            raise ValueError(f'invalid condition: {self.expression}')
+
+    def evaluate(self, values: Dict[str, str | None]) -> bool:
+        return _truthy(self._evaluate(self.tree, values))
+
+    def _evaluate(self, node: ast.AST, values: Dict[str, str | None]) -> Any:
+        if isinstance(node, ast.Name):
+            return values.get(node.id)
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.BoolOp):
+            results = (_truthy(self._evaluate(value, values)) for value in node.values)
+            return all(results) if isinstance(node.op, ast.And) else any(results)
+        if isinstance(node, ast.UnaryOp):
+            return not _truthy(self._evaluate(node.operand, values))
+        if isinstance(node, ast.Call):
+            return values.get(node.args[0].id) is not None
+
+        assert isinstance(node, ast.Compare)
+        left = self._evaluate(node.left, values)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = self._evaluate(comparator, values)
+            if left is None or right is None:
+                result = COMPARISONS[type(op)](left, right) if type(op) in (ast.Eq, ast.NotEq) else False
+            else:
+                result = COMPARISONS[type(op)](*_comparable(left, right))
+
+            if not result:
+                return False
+
+            left = right
+
+        return True
+
+@lru_cache(maxsize=None)
+def compile_condition(expression: str) -> Condition:
+    return Condition(expression)
+
+def evaluate_condition(project: Project | None, expression: str, lookup: Lookup) -> bool:
+    # O resultado depende só da expressão e dos valores que ela usa, então cada combinação é avaliada uma única vez por build
+    condition = compile_condition(expression)
+    values = tuple(lookup(name) for name in condition.names)
+    if project is None:
+        return condition.evaluate(dict(zip(condition.names, values)))
+
+    key = (expression, values)
+    result = project.conditions.get(key)
+    if result is None:
+        result = condition.evaluate(dict(zip(condition.names, values)))
+        project.conditions[key] = result
+
+    return result
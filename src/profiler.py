@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import threading
+from contextlib import nullcontext
+from typing import Any, Dict, List
+
+NULL_SPAN = nullcontext()
+
+class Span:
+    __slots__ = ('profiler', 'name', 'category', 'args', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str, category: str, args: Dict[str, Any]):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        end = time.perf_counter_ns()
+        self.profiler.add_event({
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self.start - self.profiler.origin) / 1000,
+            'dur': (end - self.start) / 1000,
+            'pid': self.profiler.pid,
+            'tid': threading.get_ident(),
+            'args': self.args
+        })
+
+class Profiler:
+    # Desligado, cada ponto de medição custa apenas a verificação de self.enabled
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events: List[Dict[str, Any]] = []
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self.counters = {}
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def span(self, name: str, category: str = 'build', **args: Any):
+        if not self.enabled:
+            return NULL_SPAN
+
+        return Span(self, name, category, args)
+
+    def add_event(self, event: Dict[str, Any]) -> None:
+        with self.lock:
+            self.events.append(event)
+
+    def instant(self, name: str, category: str = 'build', **args: Any) -> None:
+        if not self.enabled:
+            return
+
+        self.add_event({
+            'name': name,
+            'cat': category,
+            'ph': 'i',
+            's': 't',
+            'ts': (time.perf_counter_ns() - self.origin) / 1000,
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+            'args': args
+        })
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def write(self, file_path: str) -> None:
+        # Formato "Trace Event" do Chrome, pode ser aberto no chrome://tracing ou no Perfetto
+        end = (time.perf_counter_ns() - self.origin) / 1000
+        events = list(self.events)
+        for name, value in sorted(self.counters.items()):
+            events.append({'name': name, 'ph': 'C', 'ts': end, 'pid': self.pid, 'tid': 0, 'args': {'value': value}})
+
+        dirname = os.path.dirname(file_path)
+        if len(dirname) > 0:
+            os.makedirs(dirname, exist_ok=True)
+
+        with open(file_path, 'w') as file:
+            json.dump({
+                'traceEvents': events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'counters': self.counters}
+            }, file)
+
+profiler = Profiler()
@@ -1,10 +1,28 @@
 import os
+import copy
 import json
-from file import File
+from file import File, FileJournal, FileList, FileRegistry, Operation
+from asset_index import AssetIndex
+from zone_ir import ZoneCache
+from dependency_graph import DependencyGraph
 from dotenv import load_dotenv
-from typing import List
+from typing import Dict, List, Set, Tuple
 from exceptions import FileNotFoundException
 
+# Nível do deflate por extensão, o que não estiver aqui é armazenado sem compressão (sons, imagens e afins já são comprimidos)
+DEFAULT_COMPRESSION: Dict[str, int | None] = {
+    '.gsc': 6,
+    '.csc': 6,
+    '.str': 6,
+    '.csv': 6,
+    '.txt': 6,
+    '.cfg': 6,
+    '.json': 6,
+    '.menu': 6,
+    '.arena': 6,
+    '.vision': 6
+}
+
 class Project:
     def __init__(
         self,
@@ -14,7 +32,12 @@ class Project:
         version: str,
         author: str,
         fastfiles: List[str],
-        dependencies: List[str]
+        dependencies: List[str],
+        compression: Dict[str, int | None] | None = None,
+        minify: bool = False,
+        split: bool = False,
+        zone_groups: Dict[str, List[str]] | None = None,
+        environment: List[str] | None = None
     ):
         load_dotenv(os.path.join(home, '.t6modm.env'))
 
@@ -25,14 +48,32 @@ class Project:
         self.author = author
         self.fastfiles = fastfiles
         self.dependencies = dependencies
+        self.compression = compression if compression is not None else dict(DEFAULT_COMPRESSION)
+        self.minify = minify # Minifica os .gsc/.csc empacotados no alvo release
+        self.split = split # Cada dependência e cada grupo de zonas vira um fastfile, linkados em paralelo
+        self.zone_groups = zone_groups if zone_groups is not None else {} # Nome do fastfile -> zonas incluídas que vão para ele
+        self.environment = environment if environment is not None else [] # Variáveis de ambiente que as zonas podem ler
+        self.flatten = False # --flatten: as zonas incluídas e as dependências vão para uma única zona gerada
+        self.group_includes: Dict[str, Dict[str, List[str]]] = {} # Fastfile -> alvo -> includes das zonas do grupo, nesta compilação
         self.target: str = 'debug'
-        self.files: List[File] = [] # Arquivos que vão para o IWD
-        self.serverfiles: List[File] = [] # Arquivos que vão para o mod.
-        self.filtered_scripts: List[File] = []
+        self.targets: List[str] = [self.target] # Alvos de uma análise feita uma única vez para vários alvos
+        self.files = FileRegistry(os.path.join(home, 'src')) # Arquivos que vão para o IWD
+        self.serverfiles = FileRegistry(os.path.join(home, 'src')) # Arquivos que vão para o mod.
+        self.filtered_scripts = FileList()
+        self.dependency_graph = DependencyGraph(home, dependencies) # Dependências diretas e indiretas, cada uma uma única vez
         self.asset_search_path: List[str] = [os.path.join(home, 'src')]
+        self.included_zones: Dict[str, str] = {} # Zona incluída -> nome da zona temporária já gerada nesta compilação
+        self.journal: List[Operation] | None = None
+        self.zone_cache: ZoneCache | None = None
+        self.defines: Dict[str, str] = {} # -D NOME=VALOR da linha de comando
+        self.variables: Dict[str, Dict[str, str]] = {} # Alvo -> variáveis vistas pelas zonas (#if, ${NOME})
+        self.used_variables: Set[str] = set() # Variáveis que alguma zona usou, o cache do build compara os valores delas
+        self.conditions: Dict[Tuple, bool] = {} # (expressão, valores) -> resultado, avaliado uma única vez por build
+
+        for dependency in self.dependency_graph.search_order:
+            self.asset_search_path.append(dependency.source_folder)
 
-        for dependency in dependencies:
-            self.asset_search_path.append(os.path.join(dependency.replace('$HOME', home), 'src'))
+        self.asset_index = AssetIndex(self.asset_search_path, exclude=[os.path.join(home, 'src', 'zone_source', 'tempzones')])
 
     def to_file(self, file_path: str) -> None:
         dirname = os.path.dirname(file_path)
@@ -47,6 +88,11 @@ class Project:
                 'author': self.author,
                 'fastfiles': self.fastfiles,
                 'dependencies': self.dependencies,
+                'compression': self.compression,
+                'minify': self.minify,
+                'split': self.split,
+                'zone_groups': self.zone_groups,
+                'environment': self.environment,
             }, file, indent=4)
 
     @classmethod
@@ -63,14 +109,113 @@ class Project:
         author: str = data.get('author', '')
         fastfiles: List[str] = data.get('fastfiles', [])
         dependencies: List[str] = data.get('dependencies', [])
-        return cls(os.path.dirname(file_path), name, description, version, author, fastfiles, dependencies)
+        compression: Dict[str, int | None] | None = data.get('compression')
+        if compression is not None:
+            compression = {extension.lower(): level for extension, level in compression.items()}
+
+        minify: bool = data.get('minify', False)
+        split: bool = data.get('split', False)
+        zone_groups: Dict[str, List[str]] = data.get('zone_groups', {})
+        environment: List[str] = data.get('environment', [])
+
+        return cls(os.path.dirname(os.path.abspath(file_path)), name, description, version, author, fastfiles, dependencies, compression, minify, split, zone_groups, environment)
+
+    def fork(self) -> 'Project':
+        # Cópia usada para analisar uma dependência em outra thread, as alterações ficam num diário até o merge
+        fork = copy.copy(self)
+        fork.journal = []
+        fork.files = FileJournal(fork.journal, 'files')
+        fork.serverfiles = FileJournal(fork.journal, 'serverfiles')
+        fork.filtered_scripts = FileJournal(fork.journal, 'filtered_scripts')
+        fork.included_zones = dict(self.included_zones)
+        return fork
+
+    def variant(self, target: str) -> 'Project':
+        # Cópia vazia para um único alvo, os arquivos vêm depois do merge da análise feita para todos os alvos
+        variant = copy.copy(self)
+        variant.target = target
+        variant.targets = [target]
+        variant.journal = None
+        variant.files = FileRegistry(os.path.join(self.home, 'src'))
+        variant.serverfiles = FileRegistry(os.path.join(self.home, 'src'))
+        variant.filtered_scripts = FileList()
+        variant.included_zones = {}
+        return variant
+
+    def temp_zone_path(self, name: str, target: str) -> str:
+        # Com vários alvos cada um tem a sua pasta de zonas temporárias
+        folder = os.path.join(self.home, 'src', 'zone_source', 'tempzones')
+        if len(self.targets) > 1:
+            folder = os.path.join(folder, target)
+
+        return os.path.join(folder, name)
+
+    def zone_group(self, zone_name: str) -> str | None:
+        # Sem o split os grupos não valem, as zonas continuam no mod.ff
+        if not self.split:
+            return None
+
+        for group, zones in self.zone_groups.items():
+            if zone_name in zones:
+                return group
+
+        return None
+
+    def begin_include(self, zone_key: str, temp_zone_name: str) -> None:
+        if self.journal is not None:
+            self.journal.append(('begin_include', zone_key, temp_zone_name))
+
+    def end_include(self) -> None:
+        if self.journal is not None:
+            self.journal.append(('end_include',))
+
+    def add_group_include(self, group: str, line: str, target: str) -> None:
+        if self.journal is not None:
+            self.journal.append(('group_include', group, line, target))
+            return
+
+        lines = self.group_includes.setdefault(group, {}).setdefault(target, [])
+        if line not in lines:
+            lines.append(line)
+
+    def merge(self, fork: 'Project', target: str | None = None) -> None:
+        # Reaplica as operações na ordem em que uma análise sequencial as faria.
+        # Uma zona que já foi incluída antes não registra os arquivos dela de novo.
+        # Com um alvo, apenas as operações desse alvo (ou de todos) são aplicadas.
+        skipping = 0
+        for operation in fork.journal or []:
+            kind = operation[0]
+            if kind == 'begin_include':
+                if skipping > 0 or operation[1] in self.included_zones:
+                    skipping += 1
+                    continue
+
+                self.included_zones[operation[1]] = operation[2]
+                continue
+
+            if kind == 'end_include':
+                if skipping > 0:
+                    skipping -= 1
+
+                continue
+
+            if skipping > 0:
+                continue
+
+            if target is not None and operation[3] is not None and operation[3] != target:
+                continue
+
+            if kind == 'files':
+                self.files.add(operation[1], operation[2], operation[3])
+            elif kind == 'serverfiles':
+                self.serverfiles.add(operation[1], operation[2], operation[3])
+            elif kind == 'filtered_scripts':
+                self.filtered_scripts.append(File(operation[1], operation[2]), operation[3])
+            elif kind == 'group_include':
+                self.add_group_include(operation[1], operation[2], operation[3])
 
     def get_file(self, dest_path: str) -> File | None:
-        for file in self.files:
-            if file.dest == dest_path:
-                return file
+        return self.files.get(dest_path)
 
     def get_serverfile(self, dest_path: str) -> File | None:
-        for file in self.serverfiles:
-            if file.dest == dest_path:
-                return file
\ No newline at end of file
+        return self.serverfiles.get(dest_path)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, List, Tuple
+from profiler import profiler
+from argument_parser import __version__
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+KINDS = ['zone', 'member', 'script']
+
+def default_folder() -> str:
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+    if xdg_cache_home:
+        return os.path.join(xdg_cache_home, 't6modm')
+
+    if os.name == 'nt':
+        return os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 't6modm', 'cache')
+
+    return os.path.join(os.path.expanduser('~'), '.cache', 't6modm')
+
+def default_max_size() -> int:
+    # T6MODM_CACHE_SIZE em MB, pode ficar no .t6modm.env. Zero desliga o cache compartilhado.
+    try:
+        return int(float(os.environ['T6MODM_CACHE_SIZE']) * 1024 * 1024)
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_SIZE
+
+class SharedCache:
+    # Cache do usuário, compartilhado por todos os projetos da máquina. Cada entrada é endereçada pelo hash
+    # das suas entradas e da versão da ferramenta, então duas cópias da mesma dependência usam as mesmas entradas.
+    def __init__(self):
+        self.enabled = False
+        self.folder = ''
+        self.max_size = DEFAULT_MAX_SIZE
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def enable(self, folder: str | None = None, max_size: int | None = None) -> None:
+        self.folder = folder if folder is not None else default_folder()
+        self.max_size = max_size if max_size is not None else default_max_size()
+        self.enabled = self.max_size > 0
+
+    def key(self, kind: str, *parts: Any) -> str:
+        return hashlib.sha1(json.dumps([__version__, kind, *parts]).encode('utf-8')).hexdigest()
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.folder, 'objects', kind, key[:2], key)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+        if profiler.enabled:
+            profiler.count(f'shared_cache.{name}', value)
+
+    def get(self, kind: str, key: str) -> bytes | None:
+        path = self._path(kind, key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            self.count(f'{kind}.misses')
+            return None
+
+        # A data de modificação é a data do último uso, é ela que decide o que sai primeiro no prune
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.count(f'{kind}.hits')
+        return data
+
+    def put(self, kind: str, key: str, data: bytes) -> None:
+        path = self._path(kind, key)
+        partial_path = f'{path}.{os.getpid()}.{threading.get_ident()}.partial'
+
+        # Vários builds (e threads) podem gravar a mesma entrada, o arquivo final é trocado de forma atômica
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(partial_path, 'wb') as file:
+                file.write(data)
+
+            os.replace(partial_path, path)
+        except OSError:
+            return # O cache é só um atalho, um disco cheio não pode falhar o build
+
+        self.count(f'{kind}.stored')
+        self.count('bytes_written', len(data))
+
+    def flush(self) -> None:
+        # Soma os contadores deste processo às estatísticas salvas e aplica o limite de tamanho se algo foi gravado
+        if not self.enabled:
+            return
+
+        with self.lock:
+            counters, self.counters = self.counters, {}
+
+        if len(counters) == 0:
+            return
+
+        stats = read_stats(self.folder)
+        for name, value in counters.items():
+            stats[name] = stats.get(name, 0) + value
+
+        write_stats(self.folder, stats)
+        if counters.get('bytes_written', 0) > 0:
+            prune(self.folder, self.max_size)
+
+def stats_path(folder: str) -> str:
+    return os.path.join(folder, 'stats.json')
+
+def read_stats(folder: str) -> Dict[str, int]:
+    try:
+        with open(stats_path(folder), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def write_stats(folder: str, stats: Dict[str, int]) -> None:
+    try:
+        os.makedirs(folder, exist_ok=True)
+        partial_path = f'{stats_path(folder)}.{os.getpid()}.partial'
+        with open(partial_path, 'w') as file:
+            json.dump(stats, file, indent=4)
+
+        os.replace(partial_path, stats_path(folder))
+    except OSError:
+        pass
+
+def entries(folder: str) -> List[Tuple[int, int, str, str]]:
+    # (último uso, tamanho, tipo, caminho) de cada entrada
+    found: List[Tuple[int, int, str, str]] = []
+    objects = os.path.join(folder, 'objects')
+    for kind in os.listdir(objects) if os.path.isdir(objects) else []:
+        for root, _dirs, files in os.walk(os.path.join(objects, kind)):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                found.append((stat.st_mtime_ns, stat.st_size, kind, path))
+
+    return found
+
+def prune(folder: str, max_size: int) -> Tuple[int, int]:
+    # Remove as entradas usadas há mais tempo até o cache caber no limite
+    found = sorted(entries(folder))
+    total = sum(size for _mtime, size, _kind, _path in found)
+
+    removed, removed_size = 0, 0
+    for _mtime, size, _kind, path in found:
+        if total <= max_size:
+            break
+
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+
+        total -= size
+        removed += 1
+        removed_size += size
+
+    return removed, removed_size
+
+shared_cache = SharedCache()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import filecmp
+from typing import List, Tuple
+
+def replace_if_changed(partial_path: str, path: str) -> bool:
+    # Um arquivo igual ao anterior não é trocado, assim a data de modificação (e o rsync dos servidores) só muda quando o conteúdo muda
+    try:
+        if os.path.isfile(path) and filecmp.cmp(partial_path, path, shallow=False):
+            os.unlink(partial_path)
+            return False
+    except OSError:
+        pass
+
+    os.replace(partial_path, path)
+    return True
+
+def staging_folder(output_folder: str) -> str:
+    output_folder = os.path.abspath(output_folder)
+    return os.path.join(os.path.dirname(output_folder), f'.{os.path.basename(output_folder)}.staging')
+
+def _walk(root: str, keep: List[str]) -> Tuple[List[str], List[str]]:
+    # (arquivos, pastas) relativos a root, as pastas depois do que está dentro delas
+    files: List[str] = []
+    folders: List[str] = []
+    for path, dirs, names in os.walk(root, topdown=False):
+        if any(os.path.abspath(path) == kept or os.path.abspath(path).startswith(kept + os.sep) for kept in keep):
+            continue
+
+        rel = os.path.relpath(path, root)
+        files.extend(os.path.normpath(os.path.join(rel, name)) for name in names)
+        if rel != '.':
+            folders.append(rel)
+
+    return files, folders
+
+class StagedOutput:
+    # O Linker e o empacotamento escrevem numa pasta ao lado da saída, que só é atualizada quando tudo deu certo.
+    # Um build que falha deixa a saída anterior inteira, pronta para ser usada.
+    def __init__(self, output_folder: str, keep: List[str]):
+        self.output_folder = output_folder
+        self.folder = staging_folder(output_folder)
+        self.keep = [os.path.abspath(path) for path in keep]
+
+    def create(self) -> None:
+        shutil.rmtree(self.folder, ignore_errors=True) # Restos de um build interrompido
+        os.makedirs(self.folder)
+
+    def commit(self) -> Tuple[int, int, int]:
+        # Cada arquivo é trocado de forma atômica, os que não mudaram continuam os mesmos
+        os.makedirs(self.output_folder, exist_ok=True)
+        staged, _folders = _walk(self.folder, [])
+        changed = 0
+        for rel in staged:
+            path = os.path.join(self.output_folder, rel)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            changed += replace_if_changed(os.path.join(self.folder, rel), path)
+
+        # O que a saída anterior tinha e este build não gerou sai da pasta
+        staged_keys = {os.path.normcase(rel) for rel in staged}
+        files, folders = _walk(self.output_folder, self.keep)
+        removed = 0
+        for rel in files:
+            if os.path.normcase(rel) not in staged_keys:
+                os.unlink(os.path.join(self.output_folder, rel))
+                removed += 1
+
+        for rel in folders:
+            try:
+                os.rmdir(os.path.join(self.output_folder, rel)) # Só as que ficaram vazias
+            except OSError:
+                pass
+
+        self.discard()
+        return changed, len(staged) - changed, removed
+
+    def discard(self) -> None:
+        shutil.rmtree(self.folder, ignore_errors=True)
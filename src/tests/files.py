@@ -1,88 +1,44 @@
 import os
-import re
-import glob
-from file import File
-from zone_parser import ZoneParser
+from profiler import profiler
+from zone_ir import FileStatement
+from zone_parser import ZoneParser, node_test
 
-class Patterns:
-    FILE_STATEMENT = re.compile(r'(file|file_debug|file_release):\s*([\~\-\&\w\/\.\*]+)\s+([\~\-\&\w\/\.\*]+)', re.MULTILINE)
-    SERVERFILE_STATEMENT = re.compile(r'(serverfile|serverfile_debug|serverfile_release):\s*([\~\-\&\w\/\.\*]+)\s+([\~\-\&\w\/\.\*]+)', re.MULTILINE)
-
-def _process(self: ZoneParser, test: re.Match[str]):
+def _process(self: ZoneParser, node: FileStatement):
     if self.project is None: # Apenas para fazer a tipagem parar de reclamar.
         return
 
-    file_type: str = test[1]
-    file_source: str = test[2]
-    file_dest: str = test[3]
-
-    for search_path in self.project.asset_search_path:
-        current_path = os.path.join(search_path, file_source)
-        for path in glob.glob(current_path, recursive=True):
-            relative_path = os.path.relpath(path, os.path.commonpath([current_path.rstrip("*/"), path]))
-            dest_path = os.path.normpath(os.path.join(file_dest, relative_path))
-
-            if file_type == 'file':
-                file = self.project.get_file(dest_path)
-                if file is not None:
-                    from_source_mod = file.source.startswith(os.path.join(self.project.home, 'src'))
-                    if from_source_mod:
-                        continue
-
-                    self.project.files.remove(file)
-
-                self.project.files.append(File(path, dest_path))
-                continue
-
-            if file_type.startswith('file') and file_type.endswith(self.project.target):
-                file = self.project.get_file(dest_path)
-                if file is not None:
-                    from_source_mod = file.source.startswith(os.path.join(self.project.home, 'src'))
-                    if from_source_mod:
-                        continue
+    file_source = node.source
+    file_dest = node.dest
 
-                    self.project.files.remove(file)
-
-                self.project.files.append(File(path, dest_path))
-                continue
-
-            if file_type == 'serverfile':
-                file = self.project.get_serverfile(dest_path)
-                if file is not None:
-                    from_source_mod = file.source.startswith(os.path.join(self.project.home, 'src'))
-                    if from_source_mod:
-                        continue
-
-                    self.project.serverfiles.remove(file)
+    # file_debug, file_release, serverfile_debug e serverfile_release só valem para o alvo correspondente
+    if node.target is not None and node.target not in self.targets:
+        return
 
-                self.project.serverfiles.append(File(path, dest_path))
-                continue
+    # Dentro de um #if que vale só para um alvo, o arquivo também
+    target = node.target
+    if target is None and len(self.targets) < len(self.project.targets):
+        target = self.targets[0]
 
-            if file_type.startswith('serverfile') and file_type.endswith(self.project.target):
-                file = self.project.get_serverfile(dest_path)
-                if file is not None:
-                    from_source_mod = file.source.startswith(os.path.join(self.project.home, 'src'))
-                    if from_source_mod:
-                        continue
+    registry = self.project.files if node.kind == 'file' else self.project.serverfiles
+    for search_path in self.project.asset_search_path:
+        current_path = os.path.join(search_path, file_source)
+        with profiler.span('glob', pattern=file_source, search_path=search_path):
+            paths = self.project.asset_index.glob(search_path, file_source)
 
-                    self.project.serverfiles.remove(file)
+        if profiler.enabled:
+            profiler.count('glob.patterns')
+            profiler.count('glob.matches', len(paths))
 
-                self.project.serverfiles.append(File(path, dest_path))
+        for path in paths:
+            relative_path = os.path.relpath(path, os.path.commonpath([current_path.rstrip("*/"), path]))
+            dest_path = os.path.normpath(os.path.join(file_dest, relative_path))
+            registry.add(path, dest_path, target)
 
-def files(self: ZoneParser, line: str) -> bool:
+@node_test(FileStatement)
+def files(self: ZoneParser, node: FileStatement) -> bool:
     if self.project is None:
         raise Exception('no project found')
-    
-    test1 = re.match(Patterns.FILE_STATEMENT, line)
-    test2 = re.match(Patterns.SERVERFILE_STATEMENT, line)
-    if test1 is None and test2 is None:
-        return False
-
-    if test1 is not None:
-        _process(self, test1)
 
-    if test2 is not None:
-        _process(self, test2)
-    
-    self.output.append(f'// {line}')
+    _process(self, node)
+    self.output.append(f'// {node.text}')
     return True
\ No newline at end of file
@@ -1,8 +1,10 @@
-from zone_parser import ZoneParser
+from zone_ir import Header
+from zone_parser import ZoneParser, node_test
 
-def filter_headers(self: ZoneParser, line: str) -> bool:
-    if line.strip().startswith('>name,') or line.strip().startswith('>game,'):
-        self.output.append(f'// {line}')
+@node_test(Header)
+def filter_headers(self: ZoneParser, node: Header) -> bool:
+    if node.key == 'name' or node.key == 'game':
+        self.output.append(f'// {node.text}')
         return True
 
     return False
\ No newline at end of file
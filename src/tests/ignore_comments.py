@@ -1,4 +1,6 @@
-from zone_parser import ZoneParser
+from zone_ir import Comment
+from zone_parser import ZoneParser, node_test
 
-def ignore_comments(self: ZoneParser, line: str) -> bool:
-    return line.strip().startswith('//')
\ No newline at end of file
+@node_test(Comment)
+def ignore_comments(self: ZoneParser, node: Comment) -> bool:
+    return True
\ No newline at end of file
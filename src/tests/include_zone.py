@@ -1,51 +1,104 @@
 import os
-import re
+import json
+import hashlib
+import threading
+from typing import Dict, TextIO
 from i18n import _
-from uuid import uuid4 as uuid
 from colors import Colors
-from exceptions import ZoneNotFoundException
-from zone_parser import ZoneParser
+from zone_ir import Include
+from staging import replace_if_changed
+from exceptions import IncludeCycleException, ZoneNotFoundException
+from zone_parser import MatrixZoneWriter, ZoneParser, ZoneWriter, node_test, open_zone_files, temp_zone_name
 
-class Patterns:
-    INCLUDE = re.compile(r'include,\s*([^ ]+?)(?=\s*\/\/|$)')
+def child_parser(self: ZoneParser, zone_file_path: str, variables: Dict[str, Dict[str, str | None]]) -> ZoneParser:
+    zone_parser = ZoneParser(zone_file_path)
+    zone_parser.project = self.project
+    zone_parser.tests = self.tests.copy()
+    zone_parser.include_chain = self.include_chain + [zone_file_path]
+    zone_parser.targets = self.targets
+    zone_parser.variables = {target: dict(defined) for target, defined in variables.items()} # Os #define da zona incluída não voltam para esta
+    return zone_parser
+
+def parse_included(zone_parser: ZoneParser, output: TextIO | Dict[str, TextIO] | ZoneWriter | MatrixZoneWriter) -> None:
+    try:
+        zone_parser.parse(output)
+    except ZoneNotFoundException as err:
+        message = _('The file %(prefix)s"%(content)s"%(sufix)s doesn\'t exist!')
+        print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % {'prefix':Colors.YELLOW, 'content':err.file_path, 'sufix':Colors.RESET}}')
+        raise
 
-def include_zone(self: ZoneParser, line: str) -> bool:
+@node_test(Include)
+def include_zone(self: ZoneParser, node: Include) -> bool:
     if self.project is None:
         raise Exception('no project found.')
 
-    test = re.match(Patterns.INCLUDE, line)
-    if test is None:
-        return False
-
-    search_path = None
-    zone_path: str = ''
-    for search_path in self.project.asset_search_path:
-        zone_path: str = os.path.join(search_path, 'zone_source', test[1])
-        if not os.path.isfile(f'{zone_path}.zone'):
-            search_path = None
-            continue
-
-        break
+    search_path = self.project.asset_index.find(f'zone_source/{node.name}.zone')
+    zone_path: str = os.path.join(search_path or self.project.asset_search_path[-1], 'zone_source', node.name)
 
     if search_path is None:
         raise ZoneNotFoundException(self.source_path, f'{zone_path}.zone')
 
-    zone_parser = ZoneParser(f'{zone_path}.zone')
-    zone_parser.project = self.project
-    zone_parser.tests = self.tests.copy()
+    zone_file_path = os.path.abspath(f'{zone_path}.zone')
+    zone_key = os.path.normcase(zone_file_path)
+    if zone_key in map(os.path.normcase, self.include_chain):
+        raise IncludeCycleException(self.include_chain + [zone_file_path])
+
+    # Incluída dentro de um #if de um só alvo, ou depois de um #define, a zona pode sair diferente: cada combinação é uma zona temporária
+    include_key = zone_key
+    variables = {target: self.variables[target] for target in self.targets if len(self.variables.get(target, {})) > 0}
+    if len(self.targets) < len(self.project.targets) or len(variables) > 0:
+        include_key = f'{zone_key}|{json.dumps([self.targets, variables], sort_keys=True)}'
+
+    # Com o --flatten a zona é analisada direto na zona de quem incluiu, sem zona temporária
+    if self.project.flatten:
+        if include_key in self.project.included_zones:
+            self.output.append(f'// {node.text} (already included)')
+            return True
+
+        self.project.begin_include(include_key, '')
+        self.output.append(f'// >>> {node.text} ({zone_file_path})')
+        parse_included(child_parser(self, zone_file_path, variables), self.output)
+        self.output.append(f'// <<< {node.text}')
+        self.project.end_include()
+        self.project.included_zones[include_key] = ''
+        return True
+
+    # Uma zona incluída em vários lugares é analisada e escrita uma única vez por compilação
+    temp_name = self.project.included_zones.get(include_key)
+    if temp_name is None:
+        zone_parser = child_parser(self, zone_file_path, variables)
+
+        temp_name = temp_zone_name(zone_file_path)
+        if include_key != zone_key:
+            temp_name = f'{temp_name}-{hashlib.sha1(include_key.encode("utf-8")).hexdigest()[:8]}'
+
+        temp_zone_paths = {target: self.project.temp_zone_path(temp_name, target) for target in self.targets}
+
+        for temp_zone_path in temp_zone_paths.values():
+            os.makedirs(os.path.dirname(temp_zone_path), exist_ok=True)
+
+        self.project.begin_include(include_key, temp_name)
+
+        # Dependências analisadas em paralelo podem gerar a mesma zona, o arquivo final é trocado de forma atômica
+        partial_paths = {target: f'{temp_zone_path}.{threading.get_ident()}.partial' for target, temp_zone_path in temp_zone_paths.items()}
+        with open_zone_files(partial_paths) as zone_file:
+            parse_included(zone_parser, zone_file)
+
+        # Zonas temporárias iguais às do build anterior mantêm a data de modificação
+        for target, partial_path in partial_paths.items():
+            replace_if_changed(partial_path, f'{temp_zone_paths[target]}.zone')
 
-    temp_zone_name = str(uuid())
-    temp_zone_path = os.path.join(self.project.home, 'src', 'zone_source', 'tempzones', temp_zone_name)
+        self.project.end_include()
+        self.project.included_zones[include_key] = temp_name
 
-    os.makedirs(os.path.dirname(temp_zone_path), exist_ok=True)
+    # Uma zona de um grupo vai para o fastfile do grupo, e não para o desta zona
+    group = self.project.zone_group(node.name)
+    if group is not None:
+        for target in self.targets:
+            self.project.add_group_include(group, f'include,{self.project.temp_zone_path(temp_name, target)} // {node.text}', target)
 
-    with open(f'{temp_zone_path}.zone', 'w') as zone_file:
-        try:
-            zone_file.write(zone_parser.parse())
-        except ZoneNotFoundException as err:
-            message = _('The file %(prefix)s"%(content)s"%(sufix)s doesn\'t exist!')
-            print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % {'prefix':Colors.YELLOW, 'content':err.file_path, 'sufix':Colors.RESET}}')
-            raise
+        self.output.append_variants({target: f'// {node.text} ({group}.ff)' for target in self.targets})
+        return True
 
-    self.output.append(f'include,{temp_zone_path} // {line}')
+    self.output.append_variants({target: f'include,{self.project.temp_zone_path(temp_name, target)} // {node.text}' for target in self.targets})
     return True
\ No newline at end of file
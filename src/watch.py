@@ -0,0 +1,247 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import argparse
+from i18n import _
+from typing import Dict, List, Set, Tuple
+from colors import Colors
+from project import Project
+from build import build_project, load_project
+from shared_cache import shared_cache
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+class PollingWatcher:
+    # Compara o tamanho e a data de modificação de todos os arquivos a cada intervalo
+    def __init__(self, roots: List[str], files: List[str], exclude: List[str], interval: float):
+        self.roots = roots
+        self.files = files
+        self.exclude = exclude
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _walk(self, path: str, snapshot: Dict[str, Tuple[int, int]]) -> None:
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if os.path.abspath(entry.path) not in self.exclude:
+                        self._walk(entry.path, snapshot)
+
+                    continue
+
+                stat = entry.stat()
+            except OSError:
+                continue
+
+            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        for root in self.roots:
+            self._walk(root, snapshot)
+
+        for path in self.files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def poll(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+
+        snapshot = self._snapshot()
+        changed = {path for path, value in snapshot.items() if self.snapshot.get(path) != value}
+        changed.update(path for path in self.snapshot if path not in snapshot)
+
+        self.snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+class InotifyWatcher:
+    def __init__(self, roots: List[str], files: List[str], exclude: List[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.add_watch = libc.inotify_add_watch
+        self.add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.fd: int = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+        self.exclude = exclude
+        self.paths: Dict[int, str] = {}
+        self.filters: Dict[int, Set[str]] = {} # Diretórios vigiados apenas por causa de alguns arquivos
+
+        for root in roots:
+            self._watch_tree(root)
+
+        for path in files:
+            wd = self._watch(os.path.dirname(path) or '.')
+            if wd >= 0:
+                self.filters.setdefault(wd, set()).add(os.path.basename(path))
+
+    def _watch(self, path: str) -> int:
+        wd = self.add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.paths[wd] = path
+
+        return wd
+
+    def _watch_tree(self, root: str) -> None:
+        if os.path.abspath(root) in self.exclude or self._watch(root) < 0:
+            return
+
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            return
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                self._watch_tree(entry.path)
+
+    def poll(self, timeout: float) -> Set[str]:
+        changed: Set[str] = set()
+        readable, _w, _x = select.select([self.fd], [], [], timeout)
+        if len(readable) == 0:
+            return changed
+
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except OSError as err:
+            if err.errno == errno.EAGAIN:
+                return changed
+
+            raise
+
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Eventos perdidos, força uma compilação completa
+                changed.update(self.paths.values())
+                continue
+
+            directory = self.paths.get(wd)
+            if directory is None or mask & IN_IGNORED:
+                continue
+
+            names = self.filters.get(wd)
+            if names is not None and name not in names:
+                continue
+
+            path = os.path.join(directory, name) if name else directory
+            changed.add(path)
+
+            # Diretórios novos também precisam ser vigiados
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+def create_watcher(roots: List[str], files: List[str], exclude: List[str], interval: float):
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(roots, files, exclude)
+        except (OSError, AttributeError):
+            pass # Sem inotify (ou sem descritores livres), usa a verificação periódica
+
+    return PollingWatcher(roots, files, exclude, interval)
+
+def wait_for_changes(watcher, interval: float, debounce: float) -> Set[str]:
+    changed: Set[str] = set()
+    while len(changed) == 0:
+        changed.update(watcher.poll(interval))
+
+    # Espera as alterações pararem antes de compilar (editores costumam salvar em várias etapas)
+    while True:
+        more = watcher.poll(debounce)
+        if len(more) == 0:
+            return changed
+
+        changed.update(more)
+
+def run_build(project: Project, args: argparse.Namespace) -> bool:
+    try:
+        build_project(project, args)
+    except SystemExit:
+        return False
+    finally:
+        shared_cache.flush()
+
+    return True
+
+def watched_paths(project: Project, project_file: str) -> Tuple[List[str], List[str], List[str]]:
+    exclude = [os.path.abspath(os.path.join(project.home, 'src', 'zone_source', 'tempzones'))]
+    return list(project.asset_search_path), [project_file, *project.dependency_graph.project_files()], exclude
+
+def watch_project(args: argparse.Namespace) -> None:
+    project_file = os.path.join(args.project_dir, 'project.t6modm.json')
+    project = load_project(args.project_dir)
+    shared_cache.enable()
+
+    # O mesmo watcher vale para a sessão inteira, assim o que for salvo durante um build dispara o próximo
+    paths = watched_paths(project, project_file)
+    watcher = create_watcher(*paths, args.interval)
+    run_build(project, args)
+
+    try:
+        while True:
+            message = _('Watching for changes, press Ctrl+C to stop...')
+            print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message}')
+
+            changed = wait_for_changes(watcher, args.interval, args.debounce)
+
+            message = _('%s changed file(s), rebuilding...')
+            print(f'[{Colors.GREEN}INFO{Colors.RESET}] {message % len(changed)}')
+
+            project = load_project(args.project_dir)
+
+            # Só troca o watcher quando as dependências mudaram, e antes do build para não perder nada
+            if watched_paths(project, project_file) != paths:
+                watcher.close()
+                paths = watched_paths(project, project_file)
+                watcher = create_watcher(*paths, args.interval)
+
+            run_build(project, args)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -0,0 +1,298 @@
+import os
+import re
+import pickle
+import hashlib
+import itertools
+import threading
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Tuple
+from profiler import profiler
+from shared_cache import shared_cache
+
+ENDLINE = '\n'
+CACHE_VERSION = 3
+CHUNK_ROWS = 1024 # Linhas por pickle no cache em disco, a zona nunca fica inteira na memória
+SHARED_ZONE_LIMIT = 1024 * 1024 # Zonas maiores (em bytes) ficam fora do cache compartilhado, que guarda a IR inteira de uma vez
+
+# Assets lidos de um arquivo das pastas de assets. Os outros tipos (xmodel, material...) costumam vir dos fastfiles carregados.
+ASSET_FILES = {
+    'rawfile': '{name}',
+    'stringtable': '{name}',
+    'scriptparsetree': '{name}',
+    'localize': '*/localizedstrings/{name}.str',
+}
+
+# A IR de uma zona é uma sequência de linhas compactas (row): (código do tipo, texto, campos...), com o número da linha dado pela posição.
+# Os nós (__slots__) só são criados para as linhas que algum teste precisa ver, o resto volta direto como texto.
+Row = Tuple[Any, ...]
+
+class Node:
+    __slots__ = ('line_number', 'text')
+    code = 0
+
+    def __init__(self, line_number: int, text: str):
+        self.line_number = line_number
+        self.text = text # A linha original, usada quando nenhum teste reescreve o nó
+
+    @classmethod
+    def from_row(cls, line_number: int, row: Row) -> 'Node':
+        return cls(line_number, *row[1:])
+
+    def __repr__(self) -> str:
+        fields = [repr(self.line_number), repr(self.text)]
+        fields.extend(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({', '.join(fields)})'
+
+class Line(Node):
+    __slots__ = ()
+    code = 0
+
+class Comment(Node):
+    __slots__ = ()
+    code = 1
+
+class Header(Node):
+    __slots__ = ('key', 'value')
+    code = 2
+
+    def __init__(self, line_number: int, text: str, key: str, value: str):
+        Node.__init__(self, line_number, text)
+        self.key = key
+        self.value = value
+
+class Asset(Node):
+    __slots__ = ('asset_type', 'name')
+    code = 3
+
+    def __init__(self, line_number: int, text: str, asset_type: str, name: str):
+        Node.__init__(self, line_number, text)
+        self.asset_type = asset_type
+        self.name = name
+
+    @classmethod
+    def from_row(cls, line_number: int, row: Row) -> 'Node':
+        # A maior parte das linhas, o tipo e o nome saem do próprio texto para a IR ocupar menos
+        asset_type, _, name = row[1].partition(',')
+        return cls(line_number, row[1], asset_type, name)
+
+class Script(Node):
+    __slots__ = ('path', 'noignore')
+    code = 4
+
+    def __init__(self, line_number: int, text: str, path: str, noignore: bool):
+        Node.__init__(self, line_number, text)
+        self.path = path
+        self.noignore = noignore
+
+class Include(Node):
+    __slots__ = ('name',)
+    code = 5
+
+    def __init__(self, line_number: int, text: str, name: str):
+        Node.__init__(self, line_number, text)
+        self.name = name
+
+class FileStatement(Node):
+    __slots__ = ('kind', 'target', 'source', 'dest')
+    code = 6
+
+    def __init__(self, line_number: int, text: str, kind: str, target: str | None, source: str, dest: str):
+        Node.__init__(self, line_number, text)
+        self.kind = kind # file ou serverfile
+        self.target = target # debug, release ou None (todos)
+        self.source = source
+        self.dest = dest
+
+class Directive(Node):
+    __slots__ = ('name', 'argument')
+    code = 7
+
+    def __init__(self, line_number: int, text: str, name: str, argument: str):
+        Node.__init__(self, line_number, text)
+        self.name = name # define, undef, if, elif, else, endif, ifdef ou ifndef
+        self.argument = argument
+
+NODE_TYPES: List[type] = [Line, Comment, Header, Asset, Script, Include, FileStatement, Directive]
+
+class Patterns:
+    # Uma única expressão classifica a linha, a ordem das alternativas é a mesma dos testes
+    LINE = re.compile(
+        r'(?P<comment>\s*//)'
+        r'|\s*#(?P<directive>\w+)(?P<directive_argument>.*)'
+        r'|\s*>(?P<header_key>\w+),(?P<header_value>.*)'
+        r'|script,\s*(?P<script>[^ ]+?)(?=\s*//|$)'
+        r'|include,\s*(?P<include>[^ ]+?)(?=\s*//|$)'
+        r'|(?P<file_kind>(?:server)?file)(?:_(?P<file_target>debug|release))?:\s*(?P<file_source>[\~\-\&\w\/\.\*]+)\s+(?P<file_dest>[\~\-\&\w\/\.\*]+)'
+        r'|\w+,'
+    )
+    NOIGNORE = re.compile(r'\/\/\s*noignore')
+
+def _row(line: str, match: re.Match[str]) -> Row:
+    group = match.lastgroup
+    if group == 'comment':
+        return (Comment.code, line)
+    if group == 'header_value':
+        return (Header.code, line, match['header_key'], match['header_value'])
+    if group == 'script':
+        return (Script.code, line, match['script'], Patterns.NOIGNORE.search(line) is not None)
+    if group == 'include':
+        return (Include.code, line, match['include'])
+    if group == 'directive_argument':
+        return (Directive.code, line, match['directive'], match['directive_argument'].strip())
+
+    return (FileStatement.code, line, match['file_kind'], match['file_target'], match['file_source'], match['file_dest'])
+
+def parse_line(line: str) -> Row:
+    match = Patterns.LINE.match(line)
+    if match is None:
+        return (Line.code, line)
+
+    if match.lastgroup is None:
+        return (Asset.code, line)
+
+    return _row(line, match)
+
+def tokenize(source_path: str) -> Generator[Row, None, None]:
+    # Lê a zona linha por linha, a memória usada não depende do tamanho dela
+    match_line = Patterns.LINE.match
+    last_line: str | None = None
+    with open(source_path, 'r') as source_file:
+        for last_line in source_file:
+            line = last_line[:-1] if last_line.endswith(ENDLINE) else last_line
+
+            # Mesmo que parse_line, com os casos mais comuns (assets e linhas simples) resolvidos aqui
+            match = match_line(line)
+            if match is None:
+                yield (Line.code, line)
+            elif match.lastgroup is None:
+                yield (Asset.code, line)
+            else:
+                yield _row(line, match)
+
+    # Mantém o comportamento do antigo source.split('\n'): uma quebra de linha no final gera uma última linha vazia
+    if last_line is None or last_line.endswith(ENDLINE):
+        yield (Line.code, '')
+
+def nodes(rows: Iterable[Row]) -> Iterator[Node]:
+    for line_number, row in enumerate(rows, 1):
+        yield NODE_TYPES[row[0]].from_row(line_number, row)
+
+def _replay(rows: List[Row]) -> Generator[Row, None, None]:
+    yield from rows
+
+class ZoneCache:
+    # A IR de cada zona fica salva em disco e vale enquanto o caminho, o tamanho e a data de modificação não mudarem
+    def __init__(self, folder: str, keep_in_memory: bool = False):
+        self.folder = folder
+        # Só o daemon guarda as zonas já lidas na memória entre os builds, na linha de comando elas passam em streaming
+        self.memory: Dict[str, Tuple[Tuple, List[Row]]] | None = {} if keep_in_memory else None
+
+    def _cache_path(self, source_path: str) -> str:
+        digest = hashlib.sha1(os.path.normcase(os.path.abspath(source_path)).encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, f'{digest[:16]}.pickle')
+
+    def _load_shared(self, source_path: str, size: int) -> Iterator[Row]:
+        # A mesma zona (uma dependência copiada em vários projetos) tem a mesma IR, vem do cache compartilhado pelo conteúdo
+        if not shared_cache.enabled or size > SHARED_ZONE_LIMIT:
+            return tokenize(source_path)
+
+        with open(source_path, 'rb') as source_file:
+            key = shared_cache.key('zone', CACHE_VERSION, hashlib.file_digest(source_file, 'sha1').hexdigest())
+
+        data = shared_cache.get('zone', key)
+        if data is not None:
+            try:
+                return iter(pickle.loads(data))
+            except Exception:
+                pass # Entrada corrompida, a zona é lida de novo e a entrada regravada
+
+        rows = list(tokenize(source_path))
+        shared_cache.put('zone', key, pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+        return iter(rows)
+
+    def _read(self, cache_file, source_path: str) -> Generator[Row, None, None]:
+        read = 0
+        try:
+            while True:
+                chunk = pickle.load(cache_file)
+                if chunk is None:
+                    return
+
+                yield from chunk
+                read += len(chunk)
+        except Exception:
+            # Cache cortado no meio: cada linha da IR é uma linha da zona, o resto vem da própria zona
+            yield from itertools.islice(tokenize(source_path), read, None)
+        finally:
+            cache_file.close()
+
+    def _write(self, cache_path: str, key: Tuple, rows: Iterator[Row]) -> Generator[Row, None, None]:
+        # Dependências analisadas em paralelo podem salvar a mesma zona, o arquivo final é trocado de forma atômica
+        os.makedirs(self.folder, exist_ok=True)
+        partial_path = f'{cache_path}.{threading.get_ident()}.partial'
+        complete = False
+        try:
+            with open(partial_path, 'wb') as cache_file:
+                pickle.dump(key, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+                while True:
+                    chunk = list(itertools.islice(rows, CHUNK_ROWS))
+                    if len(chunk) == 0:
+                        break
+
+                    pickle.dump(chunk, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+                    yield from chunk
+
+                pickle.dump(None, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(partial_path, cache_path)
+            complete = True
+        finally:
+            # Quem lia a zona parou no meio (um erro do pré-processador), o cache parcial não vale
+            if not complete:
+                try:
+                    os.unlink(partial_path)
+                except OSError:
+                    pass
+
+    def _stream(self, source_path: str, key: Tuple, cache_path: str) -> Generator[Row, None, None]:
+        try:
+            cache_file = open(cache_path, 'rb')
+        except OSError:
+            cache_file = None
+
+        if cache_file is not None:
+            try:
+                cached_key = pickle.load(cache_file)
+            except Exception:
+                cached_key = None # Cache corrompido (ou de outra versão), a zona é lida de novo
+
+            if cached_key == key:
+                if profiler.enabled:
+                    profiler.count('zone_cache.hits')
+
+                return self._read(cache_file, source_path)
+
+            cache_file.close()
+
+        if profiler.enabled:
+            profiler.count('zone_cache.misses')
+
+        return self._write(cache_path, key, self._load_shared(source_path, key[2]))
+
+    def load(self, source_path: str) -> Generator[Row, None, None]:
+        stat = os.stat(source_path)
+        key: Tuple = (CACHE_VERSION, os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns)
+        cache_path = self._cache_path(source_path)
+
+        if self.memory is None:
+            return self._stream(source_path, key, cache_path)
+
+        cached = self.memory.get(cache_path)
+        if cached is not None and cached[0] == key:
+            if profiler.enabled:
+                profiler.count('zone_cache.hits')
+
+            return _replay(cached[1])
+
+        rows = list(self._stream(source_path, key, cache_path))
+        self.memory[cache_path] = (key, rows)
+        return _replay(rows)
@@ -1,46 +1,367 @@
 import os
+import hashlib
 from i18n import _
 from colors import Colors
-from typing import Any, Dict, List, Callable
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Set, TextIO, Tuple
 from project import Project
-from exceptions import FileNotFoundException, ZoneNotFoundException
+from profiler import profiler
+from exceptions import FileNotFoundException, ZoneNotFoundException, ZonePreprocessorException
+from zone_ir import ENDLINE, NODE_TYPES, Comment, Directive, Node, Row, parse_line, tokenize
+from preprocessor import evaluate_condition, substitute
 
-ENDLINE = '\n'
+Test = Callable[['ZoneParser', Any], bool]
+
+def node_test(node_type: type):
+    # Declara o tipo de nó (zone_ir) que o teste recebe, os outros nós nem chegam a ele
+    def decorator(test: Test) -> Test:
+        setattr(test, 'node_type', node_type)
+        return test
+
+    return decorator
+
+class Dispatcher:
+    def __init__(self, tests: List[Test]):
+        self.tests = tests
+
+        # Tipo do nó -> testes que o recebem, na ordem dos testes
+        self.by_type: Dict[type, List[Test]] = {}
+        for test in tests:
+            self.by_type.setdefault(getattr(test, 'node_type'), []).append(test)
+
+        self.by_code: List[List[Test] | None] = [self.by_type.get(node_type) for node_type in NODE_TYPES]
+
+_dispatchers: Dict[Tuple[Test, ...], Dispatcher] = {}
+
+def get_dispatcher(tests: List[Test]) -> Dispatcher:
+    key = tuple(tests)
+    dispatcher = _dispatchers.get(key)
+    if dispatcher is None:
+        dispatcher = Dispatcher(list(tests))
+        _dispatchers[key] = dispatcher
+
+    return dispatcher
+
+def temp_zone_name(zone_path: str) -> str:
+    # Nome determinístico: o mesmo arquivo de zona (caminho + conteúdo) sempre gera o mesmo nome
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(zone_path)).encode('utf-8'))
+    with open(zone_path, 'rb') as zone_file:
+        digest.update(zone_file.read())
+
+    name = os.path.splitext(os.path.basename(zone_path))[0]
+    return f'{name}-{digest.hexdigest()[:12]}'
+
+class ZoneWriter:
+    # Escreve as linhas direto no arquivo de destino (ou em memória, quando não há arquivo)
+    def __init__(self, file: TextIO | None = None):
+        self.file = file
+        self.lines: List[str] = []
+        self.count = 0
+        self.separator = ''
+
+        if file is None:
+            self.append = self.lines.append
+
+    def append(self, line: str) -> None:
+        self.file.write(self.separator + line)
+        self.separator = ENDLINE
+        self.count += 1
+
+    def append_variants(self, lines: Dict[str, str]) -> None:
+        # Uma linha diferente para cada alvo, aqui só existe um
+        for line in lines.values():
+            self.append(line)
+
+    def subset(self, targets: List[str]) -> 'ZoneWriter':
+        return self
+
+    def extend(self, other: 'ZoneWriter') -> None:
+        # Linhas de uma zona analisada em memória (uma dependência no --flatten)
+        for line in other.lines:
+            self.append(line)
+
+    def __len__(self) -> int:
+        return self.count if self.file is not None else len(self.lines)
+
+    def getvalue(self) -> str:
+        return ENDLINE.join(self.lines)
+
+class FlatZoneWriter(ZoneWriter):
+    # A zona única do --flatten: um asset citado por várias zonas (ou dependências) é escrito só na primeira vez
+    def __init__(self, file: TextIO):
+        super().__init__(file)
+        self.seen: Set[str] = set()
+
+    def append(self, line: str) -> None:
+        stripped = line.lstrip()
+        if not stripped.startswith(('//', '>')) and ',' in stripped:
+            key = stripped.split('//', 1)[0].strip()
+            if key in self.seen:
+                if profiler.enabled:
+                    profiler.count('lines.duplicates')
+
+                return
+
+            self.seen.add(key)
+
+        super().append(line)
+
+class MatrixZoneWriter:
+    # Escreve uma zona por alvo ao mesmo tempo, as linhas comuns vão para todas
+    def __init__(self, files: Dict[str, TextIO], writer: Callable[[TextIO], ZoneWriter] = ZoneWriter):
+        self.writers = {target: writer(file) for target, file in files.items()}
+
+    def append(self, line: str) -> None:
+        for writer in self.writers.values():
+            writer.append(line)
+
+    def append_variants(self, lines: Dict[str, str]) -> None:
+        for target, line in lines.items():
+            self.writers[target].append(line)
+
+    def subset(self, targets: List[str]) -> 'ZoneWriter | MatrixZoneWriter':
+        # Linhas dentro de um #if que só vale para alguns alvos vão só para as zonas deles
+        if len(targets) == 1:
+            return self.writers[targets[0]]
+
+        subset = MatrixZoneWriter({})
+        subset.writers = {target: self.writers[target] for target in targets}
+        return subset
+
+    def extend(self, other: 'MatrixZoneWriter') -> None:
+        for target, writer in other.writers.items():
+            self.writers[target].extend(writer)
+
+    def __len__(self) -> int:
+        return max(len(writer) for writer in self.writers.values())
+
+def memory_zone_writer(targets: List[str]) -> ZoneWriter | MatrixZoneWriter:
+    # Zona guardada em memória, com uma lista de linhas por alvo
+    if len(targets) == 1:
+        return ZoneWriter()
+
+    writer = MatrixZoneWriter({})
+    writer.writers = {target: ZoneWriter() for target in targets}
+    return writer
+
+@contextmanager
+def open_zone_files(paths: Dict[str, str]) -> Iterator[TextIO | Dict[str, TextIO]]:
+    # Um arquivo por alvo, com um único alvo o próprio arquivo é devolvido
+    with ExitStack() as stack:
+        files = {target: stack.enter_context(open(path, 'w')) for target, path in paths.items()}
+        yield files if len(files) > 1 else next(iter(files.values()))
+
+class ConditionFrame:
+    __slots__ = ('line_number', 'parent', 'active', 'taken', 'has_else')
+
+    def __init__(self, line_number: int, parent: List[str], active: List[str]):
+        self.line_number = line_number
+        self.parent = parent # Alvos em que o #if foi alcançado
+        self.active = active # Alvos em que o ramo atual vale
+        self.taken: Set[str] = set(active) # Alvos em que algum ramo já valeu, o #elif e o #else só valem para os outros
+        self.has_else = False
 
 class ZoneParser:
     is_dependency = False
 
     def __init__(self, file_path: str):
-        self.tests: List[Callable[['ZoneParser', str], bool]] = []
-        self.output: List[str] = []
+        self.tests: List[Test] = []
+        self.output: ZoneWriter | MatrixZoneWriter = ZoneWriter()
+        self.line_number = 0
         self.project: Project | None = None
         self.scripts: List[str] = []
         self.source_path = file_path
-        self.variables: Dict[str, Any] = {}
+        self.include_chain: List[str] = [os.path.abspath(file_path)] # Zonas sendo analisadas, da raiz até esta
+        self.variables: Dict[str, Dict[str, str | None]] = {} # Alvo -> #define e #undef desta zona (None é um #undef)
+        self.targets: List[str] = [] # Alvos em que a zona vale, um include dentro de um #if pode valer só para alguns
+        self.conditions: List[ConditionFrame] = []
 
         self.dependency: bool = ZoneParser.is_dependency
         ZoneParser.is_dependency = True
 
-    def parse(self) -> str:
+    def parse(self, output_file: TextIO | Dict[str, TextIO] | ZoneWriter | MatrixZoneWriter | None = None) -> str | None:
         if not os.path.isfile(self.source_path):
             raise FileNotFoundException(self.source_path)
 
-        self.output: List[str] = []
-        with open(self.source_path, 'r') as source_file:
-            source = source_file.read()
+        if isinstance(output_file, (ZoneWriter, MatrixZoneWriter)):
+            self.output = output_file # --flatten: as linhas vão direto para a zona de quem incluiu esta
+        else:
+            self.output = MatrixZoneWriter(output_file) if isinstance(output_file, dict) else ZoneWriter(output_file)
+        self.line_number = 0
+        if len(self.targets) == 0:
+            self.targets = list(self.project.targets) if self.project is not None else ['debug']
+        self._dispatcher = get_dispatcher(self.tests)
+
+        with profiler.span('zone', path=self.source_path):
+            # Zonas que não mudaram vêm do cache, sem passar pelas expressões regulares
+            zone_cache = self.project.zone_cache if self.project is not None else None
+            rows = zone_cache.load(self.source_path) if zone_cache is not None else tokenize(self.source_path)
+            try:
+                total = self._parse(rows)
+            finally:
+                rows.close() # Fecha a zona (e descarta um cache parcial) mesmo quando o pré-processador para no meio
+
+        if profiler.enabled:
+            profiler.count('lines.total', total)
+
+        # Sem arquivo de saída só existe um alvo, a zona fica na memória
+        if output_file is None and isinstance(self.output, ZoneWriter):
+            return self.output.getvalue()
+
+        return None
+
+    def _parse(self, rows: Iterator[Row]) -> int:
+        by_code = self._dispatcher.by_code
+        append = self.output.append
+        line_number = 0
+        for line_number, row in enumerate(rows, 1):
+            # Diretivas, linhas dentro de um #if e linhas com ${VARIAVEL} passam pelo pré-processador
+            if row[0] == Directive.code or len(self.conditions) > 0 or '${' in row[1]:
+                self.line_number = line_number
+                self._preprocess(row)
+                continue
+
+            # Linhas sem testes (xmodel,foo / localize,mod) voltam exatamente como estavam, sem criar o nó
+            tests = by_code[row[0]]
+            if tests is None:
+                append(row[1])
+                continue
+
+            self.line_number = line_number
+            self._dispatch(NODE_TYPES[row[0]].from_row(line_number, row), tests)
+
+        if len(self.conditions) > 0:
+            raise ZonePreprocessorException(self.source_path, self.conditions[-1].line_number, _('#if without #endif'))
+
+        return line_number
+
+    def lookup(self, name: str, target: str) -> str | None:
+        defined = self.variables.get(target)
+        if defined is not None and name in defined:
+            return defined[name]
+
+        if self.project is None:
+            return None
+
+        self.project.used_variables.add(name) # O cache do build compara os valores usados
+        return self.project.variables.get(target, {}).get(name)
+
+    def active_targets(self) -> List[str]:
+        return self.conditions[-1].active if len(self.conditions) > 0 else self.targets
+
+    def _evaluate(self, expression: str, targets: List[str]) -> List[str]:
+        try:
+            return [target for target in targets if evaluate_condition(self.project, expression, lambda key: self.lookup(key, target))]
+        except ValueError as err:
+            raise ZonePreprocessorException(self.source_path, self.line_number, str(err))
+
+    def _directive(self, name: str, argument: str) -> None:
+        if name in ('if', 'ifdef', 'ifndef'):
+            if len(argument) == 0:
+                raise ZonePreprocessorException(self.source_path, self.line_number, _('#%s without a condition') % name)
+
+            expression = argument if name == 'if' else f'defined({argument})' if name == 'ifdef' else f'!defined({argument})'
+            parent = self.active_targets()
+            self.conditions.append(ConditionFrame(self.line_number, parent, self._evaluate(expression, parent)))
+            return
+
+        if name in ('elif', 'else', 'endif') and len(self.conditions) == 0:
+            raise ZonePreprocessorException(self.source_path, self.line_number, _('#%s without #if') % name)
+
+        if name == 'elif' or name == 'else':
+            frame = self.conditions[-1]
+            if frame.has_else:
+                raise ZonePreprocessorException(self.source_path, self.line_number, _('#%s after #else') % name)
+
+            remaining = [target for target in frame.parent if target not in frame.taken]
+            frame.active = self._evaluate(argument, remaining) if name == 'elif' else remaining
+            frame.taken.update(frame.active)
+            frame.has_else = name == 'else'
+            return
+
+        if name == 'endif':
+            self.conditions.pop()
+            return
+
+        if name == 'define' or name == 'undef':
+            variable, _separator, value = argument.partition(' ')
+            if len(variable) == 0:
+                raise ZonePreprocessorException(self.source_path, self.line_number, _('#%s without a name') % name)
+
+            for target in self.active_targets():
+                if name == 'undef':
+                    self.variables.setdefault(target, {})[variable] = None
+                    continue
 
-        for line in source.split(ENDLINE):
-            prevent = False
-            for test in self.tests:
                 try:
-                    prevent = test(self, line)
-                except ZoneNotFoundException as err:
-                    message = _("%s isn't a valid file!")
-                    print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % err}')
+                    self.variables.setdefault(target, {})[variable] = substitute(value.strip(), lambda key: self.lookup(key, target)) if value.strip() else '1'
+                except ValueError as err:
+                    raise ZonePreprocessorException(self.source_path, self.line_number, str(err))
+
+            return
+
+        raise ZonePreprocessorException(self.source_path, self.line_number, _('unknown directive: #%s') % name)
+
+    def _preprocess(self, row: Row) -> None:
+        if row[0] == Directive.code:
+            self._directive(row[2], row[3])
+            return
+
+        targets = self.active_targets()
+        if len(targets) == 0:
+            return # Fora do #if em todos os alvos, a linha não chega ao Linker
+
+        # O texto pode mudar de um alvo para outro (${target}), cada texto diferente é analisado para os seus alvos
+        groups: Dict[str, List[str]] = {}
+        if '${' in row[1] and row[0] != Comment.code:
+            for target in targets:
+                try:
+                    text = substitute(row[1], lambda key: self.lookup(key, target))
+                except ValueError as err:
+                    raise ZonePreprocessorException(self.source_path, self.line_number, str(err))
+
+                groups.setdefault(text, []).append(target)
+        else:
+            groups[row[1]] = targets
+
+        for text, group in groups.items():
+            self._emit(row if text == row[1] else parse_line(text), group)
+
+    def _emit(self, row: Row, targets: List[str]) -> None:
+        tests = self._dispatcher.by_code[row[0]]
+        if len(targets) == len(self.targets):
+            if tests is None:
+                self.output.append(row[1])
+            else:
+                self._dispatch(NODE_TYPES[row[0]].from_row(self.line_number, row), tests)
+
+            return
+
+        # Os testes só enxergam os alvos em que a linha vale
+        output, all_targets = self.output, self.targets
+        self.output, self.targets = output.subset(targets), targets
+        try:
+            if tests is None:
+                self.output.append(row[1])
+            else:
+                self._dispatch(NODE_TYPES[row[0]].from_row(self.line_number, row), tests)
+        finally:
+            self.output, self.targets = output, all_targets
+
+    def _dispatch(self, node: Node, tests: List[Test]) -> None:
+        prevent = False
+        for test in tests:
+            try:
+                prevent = test(self, node)
+            except ZoneNotFoundException as err:
+                message = _("%s isn't a valid file!")
+                print(f'[{Colors.RED}ERR!{Colors.RESET}] {message % err}')
 
-                if prevent: break
+            if prevent:
+                if profiler.enabled:
+                    profiler.count(f'lines.{test.__name__}')
 
-            if not prevent:
-                self.output.append(line)
+                break
 
-        return ENDLINE.join(self.output)
\ No newline at end of file
+        if not prevent:
+            self.output.append(node.text)
@@ -0,0 +1,121 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from file import File
+from profiler import profiler
+from archive import ArchiveState, write_archive
+
+MTIME = 1_700_000_000 * 10**9
+
+class WriteArchiveTest(unittest.TestCase):
+    # Um arquivo montado a partir do anterior precisa sair byte a byte igual ao montado do zero
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = self.folder.name
+        self.state = ArchiveState(os.path.join(self.root, 'state.json'))
+        self.archive_path = os.path.join(self.root, 'mod.iwd')
+        self.compression = {'.wav': None, '.gsc': 9, '.str': 6}
+        self.files = [
+            self.source('sound/a.wav', b'RIFF' * 5000),
+            self.source('scripts/main.gsc', b'main() { wait 1; }\n' * 500),
+            self.source('english/localizedstrings/mod.str', b'REFERENCE MOD\nLANG_ENGLISH "Mod"\n' * 200),
+        ]
+        profiler.enable()
+
+    def tearDown(self):
+        profiler.disable()
+        self.folder.cleanup()
+
+    def source(self, dest: str, data: bytes, mtime: int = MTIME) -> File:
+        path = os.path.join(self.root, 'src', dest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        os.utime(path, ns=(mtime, mtime))
+        return File(path, dest)
+
+    def build(self) -> None:
+        members = write_archive(self.archive_path, self.files, self.state, self.compression, 2)
+        self.state.update(self.archive_path, members)
+
+    def clean_build(self) -> bytes:
+        clean_path = os.path.join(self.root, 'clean', 'mod.iwd')
+        os.makedirs(os.path.dirname(clean_path), exist_ok=True)
+        write_archive(clean_path, self.files, ArchiveState(os.path.join(self.root, 'clean', 'state.json')), self.compression, 1)
+        with open(clean_path, 'rb') as file:
+            return file.read()
+
+    def incremental_build(self) -> bytes:
+        profiler.counters = {}
+        self.build()
+        self.counters = dict(profiler.counters) # Antes do build do zero, que também conta
+        with open(self.archive_path, 'rb') as file:
+            return file.read()
+
+    def test_unchanged_members_are_reused(self):
+        self.build()
+        self.assertEqual(self.incremental_build(), self.clean_build())
+        self.assertEqual(self.counters.get('archive.reused'), 3)
+        self.assertIsNone(self.counters.get('archive.written'))
+
+    def test_changed_member(self):
+        self.build()
+        self.files[1] = self.source('scripts/main.gsc', b'main() { wait 2; }\n' * 500, MTIME + 10**9)
+        self.assertEqual(self.incremental_build(), self.clean_build())
+        self.assertEqual(self.counters.get('archive.reused'), 2)
+        self.assertEqual(self.counters.get('archive.written'), 1)
+
+    def test_added_and_removed_members(self):
+        self.build()
+        self.files.pop(0)
+        self.files.append(self.source('sound/b.wav', b'RIFF' * 100))
+        self.assertEqual(self.incremental_build(), self.clean_build())
+        self.assertEqual(self.counters.get('archive.reused'), 2)
+        self.assertEqual(self.counters.get('archive.written'), 1)
+
+    def test_compression_level_change(self):
+        self.build()
+        self.compression['.wav'] = 9
+        self.compression['.gsc'] = 1
+        self.assertEqual(self.incremental_build(), self.clean_build())
+        self.assertEqual(self.counters.get('archive.reused'), 1)
+        self.assertEqual(self.counters.get('archive.written'), 2)
+
+    def test_truncated_previous_archive(self):
+        self.build()
+        with open(self.archive_path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.archive_path) // 2)
+
+        self.assertEqual(self.incremental_build(), self.clean_build())
+        self.assertIsNone(self.counters.get('archive.reused'))
+
+    def test_corrupt_previous_archive(self):
+        # Mesmo tamanho e mesma data de modificação, o estado ainda aponta para o arquivo
+        self.build()
+        stat = os.stat(self.archive_path)
+        with open(self.archive_path, 'wb') as file:
+            file.write(b'\0' * stat.st_size)
+
+        os.utime(self.archive_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.incremental_build(), self.clean_build())
+        self.assertIsNone(self.counters.get('archive.reused'))
+
+    def test_corrupt_member_header(self):
+        # O diretório central continua válido, só o cabeçalho local de um membro foi estragado
+        self.build()
+        stat = os.stat(self.archive_path)
+        with open(self.archive_path, 'r+b') as file:
+            data = file.read()
+            file.seek(data.index(b'PK\x03\x04', 1))
+            file.write(b'XXXX')
+
+        os.utime(self.archive_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.incremental_build(), self.clean_build())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from dependency_graph import DependencyGraph, resolve_dependency
+from exceptions import DependencyNotFoundException
+
+def make_project(home: str, dependencies: list[str]) -> None:
+    os.makedirs(os.path.join(home, 'src', 'zone_source'), exist_ok=True)
+    with open(os.path.join(home, 'project.t6modm.json'), 'w') as file:
+        json.dump({'name': os.path.basename(home), 'dependencies': dependencies}, file)
+
+class ResolveDependencyTest(unittest.TestCase):
+    def test_home_variable_with_relative_home(self):
+        self.assertEqual(resolve_dependency('$HOME/deps/a', 'rel-head'), os.path.abspath(os.path.join('rel-head', 'deps', 'a')))
+
+    def test_relative_spec(self):
+        self.assertEqual(resolve_dependency('../lib', 'rel-head'), os.path.abspath('lib'))
+
+    def test_absolute_spec(self):
+        absolute = os.path.abspath(os.path.join(os.sep, 'mods', 'lib'))
+        self.assertEqual(resolve_dependency(absolute, 'rel-head'), absolute)
+
+class DependencyGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.folder = tempfile.TemporaryDirectory()
+        os.chdir(self.folder.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def test_relative_project_dir(self):
+        make_project('mod', ['$HOME/deps/a', 'deps/b'])
+        make_project(os.path.join('mod', 'deps', 'a'), ['$HOME/../b'])
+        make_project(os.path.join('mod', 'deps', 'b'), [])
+
+        graph = DependencyGraph('mod', ['$HOME/deps/a', 'deps/b'])
+        self.assertEqual([dependency.name for dependency in graph.order], ['b', 'a'])
+        self.assertTrue(all(os.path.isdir(dependency.home) for dependency in graph.order))
+
+    def test_missing_dependency(self):
+        make_project('mod', ['$HOME/deps/missing'])
+        with self.assertRaises(DependencyNotFoundException) as context:
+            DependencyGraph('mod', ['$HOME/deps/missing'])
+
+        self.assertEqual(context.exception.spec, '$HOME/deps/missing')
+
+if __name__ == '__main__':
+    unittest.main()
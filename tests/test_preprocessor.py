@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from project import Project
+from zone_parser import ZoneParser
+from exceptions import ZonePreprocessorException
+from preprocessor import compile_condition, parse_defines, zone_variables
+
+class ConditionTest(unittest.TestCase):
+    def test_operators(self):
+        values = {'A': '1', 'B': '0', 'VERSION': '3', 'MODE': 'zm'}
+        self.assertTrue(compile_condition('A && !B').evaluate(values))
+        self.assertTrue(compile_condition('B || VERSION >= 2').evaluate(values))
+        self.assertTrue(compile_condition('MODE == "zm" && defined(A) && !defined(C)').evaluate(values))
+        self.assertFalse(compile_condition('VERSION < 2').evaluate(values))
+
+    def test_unsafe_nodes_are_rejected(self):
+        for expression in ('__import__("os")', 'A.__class__', 'A + 1', 'A[0]', '[A]', 'lambda: 1', 'open(A)', 'defined(A, B)', 'defined(A=1)', '(A := 1)', 'A if B else C', 'None'):
+            with self.subTest(expression=expression), self.assertRaises(ValueError):
+                compile_condition(expression)
+
+    def test_invalid_syntax(self):
+        with self.assertRaises(ValueError):
+            compile_condition('A &&')
+
+class ZoneDirectivesTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def parse(self, *lines: str) -> list[str]:
+        zone_path = os.path.join(self.folder.name, 'mod.zone')
+        with open(zone_path, 'w') as file:
+            file.write('\n'.join(lines))
+
+        return ZoneParser(zone_path).parse().split('\n')
+
+    def test_nested_frames(self):
+        lines = self.parse(
+            '#define A',
+            '#define VERSION 2',
+            '#if A',
+            '#if VERSION >= 3',
+            'xmodel,new',
+            '#elif VERSION == 2',
+            'xmodel,two',
+            '#else',
+            'xmodel,old',
+            '#endif',
+            '#elif 1',
+            'xmodel,elif_after_taken',
+            '#else',
+            'xmodel,else_after_taken',
+            '#endif',
+            '#ifndef B',
+            'xmodel,no_b',
+            '#endif',
+        )
+        self.assertEqual(lines, ['xmodel,two', 'xmodel,no_b'])
+
+    def test_frames_skipped_by_outer_condition(self):
+        lines = self.parse('#if 0', '#if 1', 'xmodel,inner', '#else', 'xmodel,inner_else', '#endif', '#else', 'xmodel,outer_else', '#endif')
+        self.assertEqual(lines, ['xmodel,outer_else'])
+
+    def test_unterminated_if(self):
+        with self.assertRaises(ZonePreprocessorException) as context:
+            self.parse('xmodel,a', '#if 1', '#ifdef A', 'xmodel,b', '#endif')
+
+        self.assertEqual(context.exception.line_number, 2)
+
+    def test_unbalanced_directives(self):
+        for lines in (('#endif',), ('#else',), ('#if 1', '#else', '#elif 1', '#endif'), ('#if',), ('#pragma once',)):
+            with self.subTest(lines=lines), self.assertRaises(ZonePreprocessorException):
+                self.parse(*lines)
+
+    def test_substitution(self):
+        lines = self.parse('#define NAME mod', '#define FILE ${NAME}.str', 'localize,${NAME}', 'rawfile,${FILE}')
+        self.assertEqual(lines, ['localize,mod', 'rawfile,mod.str'])
+
+    def test_undefined_substitution(self):
+        with self.assertRaises(ZonePreprocessorException) as context:
+            self.parse('xmodel,a', 'localize,${MISSING}')
+
+        self.assertEqual(context.exception.line_number, 2)
+        self.assertIn('MISSING', context.exception.message)
+
+    def test_undefined_substitution_in_skipped_branch(self):
+        self.assertEqual(self.parse('#ifdef MISSING', 'localize,${MISSING}', '#endif', 'xmodel,a'), ['xmodel,a'])
+
+class ZoneVariablesTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def project(self, environment: list[str]) -> Project:
+        project_file = os.path.join(self.folder.name, 'project.t6modm.json')
+        os.makedirs(os.path.join(self.folder.name, 'src', 'zone_source'), exist_ok=True)
+        with open(project_file, 'w') as file:
+            json.dump({'name': 'mod', 'version': '1.0', 'environment': environment}, file)
+
+        return Project.from_file(project_file)
+
+    def test_only_listed_environment_variables(self):
+        project = self.project(['MOD_CHANNEL'])
+        with mock.patch.dict(os.environ, {'MOD_CHANNEL': 'beta', 'USERNAME': 'builder', 'PATH': '/bin'}):
+            variables = zone_variables(project, 'release')
+
+        self.assertEqual(variables['MOD_CHANNEL'], 'beta')
+        self.assertNotIn('USERNAME', variables)
+        self.assertNotIn('PATH', variables)
+        self.assertEqual(variables['name'], 'mod')
+        self.assertEqual(variables['target'], 'release')
+
+    def test_defines_override_environment(self):
+        project = self.project(['MOD_CHANNEL'])
+        project.defines = parse_defines(['MOD_CHANNEL=stable', 'DEBUG'])
+        with mock.patch.dict(os.environ, {'MOD_CHANNEL': 'beta'}):
+            variables = zone_variables(project, 'debug')
+
+        self.assertEqual(variables['MOD_CHANNEL'], 'stable')
+        self.assertEqual(variables['DEBUG'], '1')
+
+if __name__ == '__main__':
+    unittest.main()